@@ -0,0 +1,28 @@
+#boatParams.py
+#Boat specific constants for the vectorized models (the *Vec functions in speedModel and planingModel),
+#gathered in one object so they can be varied without editing the model code.
+#Any field can be a numpy array, which the vectorized models broadcast against the wind and sail arrays.
+#E.g. fields of shape (nBoats,1) against data of shape (nRows,) give speeds of shape (nBoats,nRows).
+
+import numpy as np
+
+class BoatParams:
+  #Defaults are the constants hardcoded in the scalar models
+  def __init__(self, pointingAngle=50, windySpeedFactor=0.5, beatingFactor=0.6, percentageMainDriven=0.65,
+               jibOffset=5, planingTol=3.0):
+    self.pointingAngle = pointingAngle                #The best angle we can point without huge speed loss
+    self.windySpeedFactor = windySpeedFactor          #In very windy conditions, what proportion of the windspeed is beam reach?
+    self.beatingFactor = beatingFactor                #How fast can you beat relative to beam reach speed?
+    self.percentageMainDriven = percentageMainDriven  #How important the main is relative to the jib
+    self.jibOffset = jibOffset                        #At max trim, how much should jib be eased?
+    self.planingTol = planingTol                      #How close to optimal trim (deg) you need to be to plane
+
+  #Number of boat configurations held (1 if every field is a scalar)
+  def size(self):
+    return int(np.broadcast(*vars(self).values()).size)
+
+  #Builds params for a sweep: every given field is a 1-D array of length nBoats (fields left out keep their
+  #defaults) and is reshaped to (nBoats,1), so a vectorized model call returns an (nBoats,nRows) array
+  @staticmethod
+  def sweep(**fields):
+    return BoatParams(**{k: np.asarray(v, dtype=float).reshape(-1,1) for k,v in fields.items()})
@@ -0,0 +1,46 @@
+#cespCache.py
+#Where cached artifacts (optimal references, converted datasets, expanded features, ...) live on disk, plus
+#helpers for keying and writing them.  Set CESP_CACHE in the environment to move the cache somewhere else.
+
+import os
+import json
+import hashlib
+import numpy as np
+
+CacheRoot = os.environ.get('CESP_CACHE', '.cespCache')
+
+#Directory for one kind of cached artifact, created if needed
+def cacheDir(kind):
+  d = os.path.join(CacheRoot, kind)
+  os.makedirs(d, exist_ok=True)
+  return d
+
+#Short hex key for a description of what's cached.  Parts must be json-able or numpy arrays (hashed by content)
+def hashKey(*parts):
+  h = hashlib.sha1()
+  for p in parts:
+    if isinstance(p, np.ndarray):
+      h.update((str(p.dtype) + str(p.shape)).encode())
+      h.update(np.ascontiguousarray(p).tobytes())
+    else:
+      h.update(json.dumps(p, sort_keys=True).encode())
+  return h.hexdigest()[:16]
+
+#Hash of the source of the given modules, so cached model outputs go stale when the model code changes
+def sourceKey(*modules):
+  h = hashlib.sha1()
+  for m in modules:
+    with open(m.__file__,'rb') as f:
+      h.update(f.read())
+  return h.hexdigest()[:16]
+
+#Module name without the package/__main__ noise (a model run as a script is still e.g. 'planingModel')
+def moduleName(module):
+  return os.path.splitext(os.path.basename(module.__file__))[0]
+
+#Saves an array as .npy atomically (write a temp file, then rename), so other processes never see half a file
+def saveArray(fName, arr):
+  tmp = fName + '.' + str(os.getpid()) + '.tmp'
+  with open(tmp,'wb') as f:
+    np.save(f, arr)
+  os.replace(tmp, fName)
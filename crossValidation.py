@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+#crossValidation.py
+#Train/validation splits built from one permutation of the row numbers, and k-fold cross validation of the
+#training scripts' controllers.  A split only gathers the rows it needs with take(), so there is no isin() hash
+#probe, and the folds are fit and scored on a process pool.  Reports the mean and variance of each metric over folds.
+#usage: ./crossValidation.py -f <data file> --trainer <knn|linear|rf> -k <folds> -s <seed> --model <model name> --workers <N>
+
+import os
+import sys
+import getopt
+import importlib
+import multiprocessing as mp
+import numpy as np
+import speedModel as sm
+import planingModel as pm
+from dataLoader import loadData
+
+Models = {'default': sm, 'planing': pm}
+
+#A permutation of range(n): from the global numpy seed (so np.random.seed() keeps scripts repeatable) or from seed
+def permutation(n, seed=None):
+  if seed is None:
+    return np.random.permutation(n)
+  return np.random.default_rng(seed).permutation(n)
+
+#Rows idx of x (sorted, so memory mapped data is read front to back) as a new frame indexed from 0
+def takeRows(x, idx):
+  return x.take(np.sort(idx)).reset_index(drop=True)
+
+#Splits x into (train, validation) frames with a vFrac share of the rows held out
+#Same sizes as x.sample(frac=vFrac) and its complement, both in x's row order
+def trainValSplit(x, vFrac=0.2, seed=None):
+  perm = permutation(len(x), seed)
+  nVal = int(round(vFrac*len(x)))
+  return (takeRows(x, perm[nVal:]), takeRows(x, perm[:nVal]))
+
+#Fold boundaries: fold i holds the rows perm[bounds[i]:bounds[i+1]]
+def foldBounds(n, k):
+  return np.linspace(0, n, k+1).astype(int)
+
+#The (train, validation) row numbers for fold i
+def foldIndices(perm, bounds, i):
+  return (np.concatenate([perm[:bounds[i]], perm[bounds[i+1]:]]), perm[bounds[i]:bounds[i+1]])
+
+#Default fold score: the controller against the model's optimal trim (val isn't needed)
+def controllerScore(model):
+  def score(controller, val):
+    mse, meanError = model.coarseErrorvOpt(controller)
+    return {'mse': float(mse), 'meanError': float(meanError)}
+  return score
+
+#What the pool workers fit and score, (x, perm, bounds, train, score).  Set before the pool forks, so neither the
+#data nor closures get pickled
+_cvJob = None
+
+def _initWorker(job):
+  global _cvJob
+  _cvJob = job
+
+#Fits and scores fold i of the pool's job
+def _runFold(i):
+  x, perm, bounds, train, score = _cvJob
+  tr, val = foldIndices(perm, bounds, i)
+  return score(train(takeRows(x, tr)), takeRows(x, val))
+
+#k-fold cross validation: train(x) -> controller is fit on every k-1 folds and scored with score(controller, val)
+#-> {metric: value} on the fold left out (by default controllerScore(model)).  Folds run on workers processes
+#(None for every core).  Returns {'folds': [fold scores], 'mean': {metric: mean}, 'var': {metric: variance}}
+def crossValidate(x, train, k=5, model=pm, score=None, seed=None, workers=1):
+  global _cvJob
+  score = score or controllerScore(model)
+  perm = permutation(len(x), seed)
+  bounds = foldBounds(len(x), k)
+  job = (x, perm, bounds, train, score)
+  workers = min(workers or os.cpu_count(), k)
+  if workers <= 1:
+    _cvJob = job
+    try:
+      folds = [_runFold(i) for i in range(k)]
+    finally:
+      _cvJob = None
+  else:
+    if 'fork' in mp.get_all_start_methods():
+      _cvJob = job
+      pool = mp.get_context('fork').Pool(workers)
+    else:                                     #Without fork the data, train and score have to be picklable
+      pool = mp.Pool(workers, initializer=_initWorker, initargs=(job,))
+    try:
+      with pool:
+        folds = pool.map(_runFold, range(k), chunksize=1)
+    finally:
+      _cvJob = None
+
+  metrics = list(folds[0].keys())
+  mean = {m: float(np.mean([f[m] for f in folds])) for m in metrics}
+  var = {m: float(np.var([f[m] for f in folds], ddof=1)) if k > 1 else 0.0 for m in metrics}
+  return {'folds': folds, 'mean': mean, 'var': var}
+
+def main(argv):
+  usage = 'usage: ./crossValidation.py -f <data file> --trainer <knn|linear|rf> -k <folds> -s <seed> --model <model name> --workers <N>'
+  fName = 'genTrain.csv'
+  trainer = 'linear'
+  k = 5
+  seed = 0
+  model = 'planing'
+  workers = None
+  try:
+    opts, args = getopt.getopt(argv,"hf:k:s:m:",["file=","trainer=","model=","workers="])
+  except getopt.GetoptError as e:
+    print("Parse Error")
+    print(e.msg)
+    print(usage)
+    sys.exit(2)
+
+  for opt, arg in opts:
+    if opt == '-h':
+      print(usage)
+      sys.exit()
+    elif opt in ("--file","-f"):
+      fName = arg
+    elif opt == "--trainer":
+      trainer = arg
+    elif opt == "-k":
+      k = int(arg)
+    elif opt == "-s":
+      seed = int(arg)
+    elif opt in ("--model","-m"):
+      if arg == "default":
+        model = "default"
+    elif opt == "--workers":
+      workers = int(arg)
+
+  print('Reading data from ' + fName)
+  x = loadData(fName)
+  print(str(k) + '-fold cross validation of ' + trainer + ' against ' + model + ' model, ' + str(len(x)) + ' rows')
+  res = crossValidate(x, importlib.import_module(trainer).train, k, Models[model], seed=seed, workers=workers)
+  for i, f in enumerate(res['folds']):
+    print('Fold ' + str(i) + ': ' + str(f))
+  for m in res['mean']:
+    print(m + ': mean ' + str(res['mean'][m]) + ', variance ' + str(res['var'][m]))
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
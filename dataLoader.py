@@ -0,0 +1,216 @@
+#dataLoader.py
+#Loads a dataset written by generateCSV into a DataFrame with the windSpeed/windDir/main/jib/boatSpeed columns,
+#whatever format it was written in (picked from the file extension):
+#  .csv      text, parsed by pandas
+#  .npy      (rows,5) float64 array stored column-major, memory mapped, so each column is a zero-copy view
+#  .parquet  columnar, needs pyarrow
+#  .arrow    Arrow IPC file, needs pyarrow, read through a memory map
+#  .json     a shard manifest from generateCSV --manifest; the shards are loaded and concatenated in order
+#A csv can also be compressed, as .csv.gz (gzip), .csv.zst (zstd, needs zstandard) or .csv.lz4 (needs lz4), and is
+#decompressed as it's parsed.  Parquet and arrow files carry their compression inside, so read the same either way
+#Csv files are only parsed the first time: loadData saves them as .npy under the cache directory and memory maps
+#that copy on later runs, for as long as the csv's path, size and mtime (or with byContent, its bytes) stay the same
+#With CESP_DTYPE=float32 in the environment (or loadData(..., dtype=np.float32)) every format is read through a
+#memory mapped float32 copy instead, and featureView() hands the fitters views of it, so nothing is copied to float64
+
+import os
+import glob
+import json
+import hashlib
+import importlib
+import numpy as np
+import pandas as pd
+import cespCache
+
+Columns = ['windSpeed', 'windDir', 'main', 'jib', 'boatSpeed']
+Formats = {'.csv': 'csv', '.npy': 'npy', '.parquet': 'parquet', '.arrow': 'arrow', '.json': 'manifest'}
+Codecs = {'.gz': 'gzip', '.zst': 'zstd', '.lz4': 'lz4'}
+DefaultDtype = np.dtype(os.environ.get('CESP_DTYPE', 'float64'))   #CESP_DTYPE=float32 loads everything as float32
+
+#Splits a compression suffix off fName: returns (fName without it, codec), codec None if there isn't one
+def splitCodec(fName):
+  root, ext = os.path.splitext(fName)
+  codec = Codecs.get(ext.lower())
+  return (root, codec) if codec else (fName, None)
+
+#Suffix for files compressed with codec ('' for None)
+def codecSuffix(codec):
+  return [ext for ext, c in Codecs.items() if c == codec][0] if codec else ''
+
+#Format of a dataset file from its extension, ignoring any compression suffix (csv if it isn't one we know)
+def formatOf(fName):
+  return Formats.get(os.path.splitext(splitCodec(fName)[0])[1].lower(), 'csv')
+
+#Extension to give a file in format fmt
+def extensionOf(fmt):
+  return [ext for ext, f in Formats.items() if f == fmt][0]
+
+#pyarrow is only needed for parquet and arrow files, so it's only imported for them
+def needPyarrow(fmt):
+  try:
+    import pyarrow
+  except ImportError:
+    raise ImportError('The ' + fmt + ' format needs pyarrow (pip install pyarrow)')
+  return pyarrow
+
+#The module implementing codec: gzip is in the standard library, zstd and lz4 are only imported when used
+def needCodec(codec):
+  if codec == 'gzip':
+    import gzip
+    return gzip
+  name = {'zstd': 'zstandard', 'lz4': 'lz4.frame'}[codec]
+  try:
+    return importlib.import_module(name)
+  except ImportError:
+    raise ImportError('The ' + codec + ' codec needs ' + name.split('.')[0] + ' (pip install ' + name.split('.')[0] + ')')
+
+#Opens fName for reading, decompressing on the fly if it has a compression suffix
+#Files may hold several compressed frames back to back (generateCSV writes one per chunk), which all get read
+def openData(fName):
+  codec = splitCodec(fName)[1]
+  if codec is None:
+    return open(fName,'rb')
+  mod = needCodec(codec)
+  if codec == 'zstd':
+    return mod.ZstdDecompressor().stream_reader(open(fName,'rb'), read_across_frames=True, closefd=True)
+  return mod.open(fName,'rb')
+
+#Name of the cached .npy copy of fName in dtype, as '<source key>_<version key>.npy'
+#The source is the file's absolute path (and dtype, unless float64) and the version its size and mtime, or with
+#byContent a hash of its bytes (slower, since the whole file is read, but it survives copies and touches)
+def cacheName(fName, byContent=False, dtype=np.float64):
+  tag = [] if np.dtype(dtype) == np.float64 else [np.dtype(dtype).name]
+  if byContent:
+    h = hashlib.sha1()
+    with open(fName,'rb') as f:
+      for block in iter(lambda: f.read(1<<20), b''):
+        h.update(block)
+    source, version = 'content', cespCache.hashKey(h.hexdigest(), *tag)
+  else:
+    st = os.stat(fName)
+    source, version = cespCache.hashKey(os.path.abspath(fName), *tag), cespCache.hashKey(st.st_size, st.st_mtime_ns)
+  return os.path.join(cespCache.cacheDir('data'), source + '_' + version + '.npy')
+
+#Moves the finished temp file tmp into place as cached, then deletes any older versions cached for the same source
+def publishCache(tmp, cached):
+  os.replace(tmp, cached)
+  source = os.path.basename(cached).split('_')[0]
+  if source != 'content':
+    for old in glob.glob(os.path.join(os.path.dirname(cached), source + '_*.npy')):
+      if old != cached:
+        os.remove(old)
+
+#Writes x's Columns to the cache file cached as a column-major dtype array (like generateCSV's .npy files), a column
+#at a time, so converting a memory mapped x (e.g. to float32) only holds one column in memory
+def saveColumns(x, cached, dtype):
+  tmp = cached + '.' + str(os.getpid()) + '.tmp'
+  out = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(len(x),len(Columns)), fortran_order=True)
+  for i, c in enumerate(Columns):
+    out[:,i] = x[c].to_numpy()
+  out.flush()
+  del out
+  publishCache(tmp, cached)
+
+#Number of data rows in the csv fName, from its line count without parsing (an overestimate if it has blank lines)
+def countRows(fName):
+  n = 0
+  last = b'\n'
+  with openData(fName) as f:
+    for block in iter(lambda: f.read(1<<20), b''):
+      n += block.count(b'\n')
+      last = block[-1:]
+  return n - 1 + (last != b'\n')      #Not the header, but a last line without a newline
+
+#Parses the csv fName into the cache file cached (a float64 saveColumns file) chunkSize rows at a time, so files
+#bigger than memory can be converted.  Returns False, caching nothing, if its columns aren't Columns
+def cacheCsv(fName, cached, chunkSize=500000):
+  n = countRows(fName)
+  tmp = cached + '.' + str(os.getpid()) + '.csv.tmp'     #saveColumns' temp name is taken if it has to be trimmed
+  out = None
+  rows = 0
+  try:
+    with openData(fName) as f:
+      for chunk in pd.read_csv(f, chunksize=chunkSize):
+        if out is None:
+          if sorted(chunk.columns) != sorted(Columns):
+            return False
+          out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(n,len(Columns)), fortran_order=True)
+        if rows + len(chunk) > n:
+          raise ValueError(fName + ' has more rows than lines')
+        out[rows:rows+len(chunk)] = chunk[Columns].to_numpy(dtype=np.float64)
+        rows += len(chunk)
+    if out is None:
+      return False
+    if rows < n:            #Blank lines or quoted newlines: copy what was parsed to a file of the right length
+      saveColumns(pd.DataFrame(out[:rows], columns=Columns, copy=False), cached, np.float64)
+      out = None
+      os.remove(tmp)
+      return True
+    out.flush()
+    out = None
+    publishCache(tmp, cached)
+    return True
+  except BaseException:     #A bad cell or a read error mustn't leave a (possibly huge) half written file behind
+    out = None
+    if os.path.exists(tmp):
+      os.remove(tmp)
+    raise
+
+#Reads fName (the first nrows rows if given) into a DataFrame with the Columns columns
+#With cache a csv is read through its cached .npy copy (made on the first call, parsing the csv a chunk at a time),
+#cache=False always parses it.  Asking for nrows before the copy exists just parses those rows, and caches nothing
+#dtype (by default DefaultDtype, float64 unless $CESP_DTYPE says otherwise) other than float64 reads any format
+#through a cached, memory mapped copy in that dtype, e.g. float32 for half the memory.  Files whose columns
+#aren't Columns are never cached, and come back as parsed
+def loadData(fName, nrows=None, cache=True, byContent=False, dtype=None):
+  dtype = np.dtype(dtype or DefaultDtype)
+  fmt = formatOf(fName)
+  if dtype != np.float64 or (fmt == 'csv' and cache):
+    cached = cacheName(fName, byContent, dtype)
+    if not os.path.exists(cached):
+      if dtype != np.float64:
+        x = loadData(fName, cache=cache, byContent=byContent, dtype=np.float64)
+        if sorted(x.columns) != sorted(Columns):
+          return x if nrows is None else x.iloc[:nrows]
+        saveColumns(x, cached, dtype)
+      elif nrows is not None or not cacheCsv(fName, cached):
+        with openData(fName) as f:
+          return pd.read_csv(f, nrows=nrows)
+    fName, fmt = cached, 'npy'
+
+  if fmt == 'npy':
+    arr = np.load(fName, mmap_mode='r')
+    if nrows is not None:
+      arr = arr[:nrows]
+    return pd.DataFrame(arr, columns=Columns, copy=False)
+  elif fmt == 'parquet':
+    needPyarrow(fmt)
+    import pyarrow.parquet as pq
+    x = pq.read_table(fName).to_pandas(split_blocks=True)
+  elif fmt == 'arrow':
+    pa = needPyarrow(fmt)
+    with pa.memory_map(fName, 'r') as src:
+      x = pa.ipc.open_file(src).read_all().to_pandas(split_blocks=True)
+  elif fmt == 'manifest':
+    with open(fName,'r') as f:
+      meta = json.load(f)
+    root = os.path.dirname(fName)
+    x = pd.concat([loadData(os.path.join(root, s['file']), dtype=np.float64) for s in meta['shards']], ignore_index=True)
+  else:
+    with openData(fName) as f:
+      return pd.read_csv(f, nrows=nrows)
+  return x if nrows is None else x.iloc[:nrows]
+
+#x's columns cols (by default all but boatSpeed, in the sorted order the fitters use) as an (n,len(cols)) array
+#It's a view of x's data rather than a copy when x is one block, as loadData's npy frames and crossValidation's
+#splits of them are, and cols sit at evenly spaced positions in it (the default is Columns[3::-1])
+def featureView(x, cols=None):
+  if cols is None:
+    cols = x.columns.difference(['boatSpeed'])
+  arr = x.to_numpy()
+  pos = [x.columns.get_loc(c) for c in cols]
+  step = pos[1]-pos[0] if len(pos) > 1 else 1
+  if step != 0 and pos == list(range(pos[0], pos[0]+step*len(pos), step)):
+    stop = pos[-1]+step
+    return arr[:, pos[0]:(stop if stop >= 0 else None):step]
+  return arr[:, pos]
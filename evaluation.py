@@ -0,0 +1,138 @@
+#evaluation.py
+#Scores controllers against a speed model (speedModel or planingModel).
+#A controller is a function controller(windSpeed, windDir) -> (main, jib, ...).  It can also provide a batch
+#version as the attribute controller.batch(windSpeeds, windDirs) -> (mains, jibs), taking and returning arrays.
+#Evaluators use the batch version when it's there, so a model-backed controller predicts every condition in
+#one go rather than rebuilding its inputs once per condition.
+#Scalar-only controllers can instead be spread over a process pool (workers=N, or None for every core).
+
+import os
+import multiprocessing as mp
+import numpy as np
+from optReference import optimalReference, CoarseSpeeds, CoarseDirs
+
+#The controller pool workers call.  Set before the pool forks, so controllers that can't be pickled
+#(e.g. the closures in knn.py) still reach the workers
+_poolController = None
+
+def _initWorker(controller):
+  global _poolController
+  _poolController = controller
+
+#Runs the pool controller over one shard of (windSpeed, windDir) conditions
+def _controlShard(shard):
+  return [_poolController(wSpd,wDir)[:2] for wSpd,wDir in shard]
+
+#Calls a scalar controller on every condition, across workers processes if workers != 1
+#The conditions are cut into contiguous shards and pool.map hands the results back in shard order,
+#so the output is the same whatever the worker count
+def scalarControls(controller, windSpeeds, windDirs, workers=1):
+  global _poolController
+  conds = list(zip(np.asarray(windSpeeds).tolist(), np.asarray(windDirs).tolist()))
+  workers = workers or os.cpu_count()
+  if workers <= 1 or len(conds) < 2:
+    sails = [controller(wSpd,wDir)[:2] for wSpd,wDir in conds]
+  else:
+    nShards = min(len(conds), 4*workers)      #A few shards per worker evens out slow ones
+    bounds = np.linspace(0,len(conds),nShards+1).astype(int)
+    shards = [conds[bounds[k]:bounds[k+1]] for k in range(nShards)]
+    if 'fork' in mp.get_all_start_methods():
+      _poolController = controller
+      pool = mp.get_context('fork').Pool(workers)
+    else:                                     #Without fork the controller has to be picklable
+      pool = mp.Pool(workers, initializer=_initWorker, initargs=(controller,))
+    try:
+      with pool:
+        sails = [s for shard in pool.map(_controlShard, shards, chunksize=1) for s in shard]
+    finally:
+      _poolController = None
+  sails = np.array(sails, dtype=float).reshape(-1,2)
+  return (sails[:,0], sails[:,1])
+
+#Turns a batch function into a controller: callable with scalars as usual, with the batch function attached
+def batchController(batchFunc):
+  def controller(windSpeed, windDir):
+    m, j = batchFunc(np.array([windSpeed], dtype=float), np.array([windDir], dtype=float))[:2]
+    return (m[0], j[0])
+  controller.batch = batchFunc
+  return controller
+
+#Returns (mains, jibs) arrays for arrays of conditions, through controller.batch if the controller has one
+#and through scalarControls (using workers processes) otherwise
+def controls(controller, windSpeeds, windDirs, workers=1):
+  if hasattr(controller, 'batch'):
+    m, j = controller.batch(np.asarray(windSpeeds, dtype=float), np.asarray(windDirs, dtype=float))[:2]
+    return (np.asarray(m, dtype=float), np.asarray(j, dtype=float))
+  return scalarControls(controller, windSpeeds, windDirs, workers)
+
+#Given a controller, returns the MSE versus optimal for a grid of sailing conditions
+# And also the average percent error
+#All the controls are scored with one vectorized model call (or table lookup, if a responseSurface.SpeedTable is given)
+#With a table the optimal trim is looked up in it too, so the table's interpolation error doesn't count against the
+#controller (the optimal controller scores 0 either way)
+#workers sets the process count for scalar-only controllers (None = every core)
+def coarseErrorvOpt(controller, model, table=None, workers=1):
+  wSpds, wDirs = [g.ravel() for g in np.meshgrid(CoarseSpeeds, CoarseDirs, indexing='ij')]
+  mains, jibs = controls(controller, wSpds, wDirs, workers)
+  speedFunc = model.resultantSpeedVec if table is None else table.lookup
+  actualSpeed = speedFunc(wSpds,wDirs,mains,jibs)
+  bad = np.isnan(actualSpeed)
+  if bad.any():
+    print("coarseErrorvOpt: controller gave " + str(bad.sum()) + " out of range sail positions")
+  optMains, optJibs, optSpeed = [a.ravel() for a in optimalReference(model)]   #Cached, in the same (windSpeed-major) order
+  if table is not None:
+    optSpeed = table.lookup(wSpds,wDirs,optMains,optJibs)
+  mse = ((actualSpeed - optSpeed)**2).mean()
+  percent = abs(np.array(actualSpeed - optSpeed)).mean()
+  return (mse,percent)
+
+#Continuous-domain version of coarseErrorvOpt.  (windSpeed, windDir) is drawn over spdRange x dirRange from
+#nReps independently scrambled Sobol (or Halton) sequences, batchSize points from each per round.  The spread
+#of the per-sequence means gives confidence intervals (randomized QMC), and sampling stops once both the MSE and
+#mean error intervals are narrower than +-precision, as soon as the MSE interval lies entirely above worseThan
+#(the controller is clearly worse than that threshold), or after maxSamples points.
+#Returns a dict with mse, mseCI, meanError, meanErrorCI, samples and stopped (the reason sampling ended)
+def qmcErrorvOpt(controller, model, precision=0.01, worseThan=None, sampler='sobol', batchSize=256, nReps=8,
+                 maxSamples=2**16, spdRange=(1,17), dirRange=(50,179), confidence=0.95, seed=0, workers=1):
+  from scipy.stats import qmc, t as tDist       #Here rather than at the top so the models don't pull in scipy.stats
+  if sampler == 'sobol':
+    engine = qmc.Sobol
+  elif sampler == 'halton':
+    engine = qmc.Halton
+  else:
+    raise ValueError('Unknown sampler: ' + str(sampler))
+  engines = [engine(d=2, scramble=True, seed=np.random.default_rng(s)) for s in np.random.SeedSequence(seed).spawn(nReps)]
+  tCrit = tDist.ppf((1+confidence)/2.0, nReps-1)
+
+  sqSum = np.zeros(nReps)
+  absSum = np.zeros(nReps)
+  n = 0
+  while True:
+    pts = qmc.scale(np.vstack([e.random(batchSize) for e in engines]), [spdRange[0],dirRange[0]], [spdRange[1],dirRange[1]])
+    wSpds, wDirs = pts[:,0], pts[:,1]
+    mains, jibs = controls(controller, wSpds, wDirs, workers)
+    err = (model.resultantSpeedVec(wSpds,wDirs,mains,jibs) - model.peekOptimalVec(wSpds,wDirs)[2]).reshape(nReps,batchSize)
+    sqSum += (err**2).sum(axis=1)
+    absSum += np.abs(err).sum(axis=1)
+    n += batchSize
+
+    #Mean and CI half-width over the replicates
+    res = {'samples': n*nReps}
+    for name, sums in (('mse',sqSum), ('meanError',absSum)):
+      reps = sums/n
+      half = tCrit*reps.std(ddof=1)/np.sqrt(nReps)
+      res[name] = reps.mean()
+      res[name + 'CI'] = (reps.mean()-half, reps.mean()+half)
+
+    if np.isnan(err).any():
+      print("qmcErrorvOpt: controller gave " + str(np.isnan(err).sum()) + " out of range sail positions")
+      res['stopped'] = 'outOfRange'
+    elif worseThan is not None and res['mseCI'][0] > worseThan:
+      res['stopped'] = 'worseThan'
+    elif max(res['mseCI'][1]-res['mse'], res['meanErrorCI'][1]-res['meanError']) < precision:
+      res['stopped'] = 'precision'
+    elif n*nReps >= maxSamples:
+      res['stopped'] = 'maxSamples'
+    else:
+      continue
+    return res
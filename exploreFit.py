@@ -19,6 +19,9 @@ from sklearn.neighbors import KNeighborsRegressor as KNN
 from sklearn.ensemble import RandomForestRegressor as RFR
 import sklearn.mixture as Mix
 import scipy.optimize as Opt
+from dataLoader import loadData
+from crossValidation import trainValSplit
+import featureStore
 
 #Returns an X data frame (*without* boatspeed) with polynomial expansion up to power Power.
 #Useful preprocessor for linear regression
@@ -64,19 +67,9 @@ def polyExpand(data, power=1):
 
 #Given a controller, returns the MSE versus optimal for a grid of sailing conditions
 # And also the average percent error
+#Same as speedModel's, which scores in one vectorized call against the cached optimal reference
 def coarseErrorvOpt(controller):
-  actualSpeed = []
-  optSpeed = []
-  for wSpd in range(1,18):
-    for wDir in range(50,180):
-      m,j = controller(wSpd,wDir)[:2]
-      actualSpeed.append(sm.resultantSpeed(wSpd,wDir,m,j))
-      optSpeed.append(sm.peekOptimal(wSpd,wDir)[2])
-  actualSpeed = np.array(actualSpeed)
-  optSpeed = np.array(optSpeed)
-  mse = ((actualSpeed - optSpeed)**2).mean()
-  percent = abs(np.array(actualSpeed - optSpeed)).mean()
-  return (mse,percent)
+  return sm.coarseErrorvOpt(controller)
 
 
 def main():
@@ -86,19 +79,13 @@ def main():
   # fileName = 'planeTrain.csv'
   fileName = 'genTrain.csv'
   print('Reading data from hardcoded file: ' + fileName)
-  with open(fileName,'r') as f:
-    x = pd.read_csv(f)#, nrows= 1000)
+  x = loadData(fileName)#, nrows= 1000)
 
   #Get a validation set
   print('Creating Validation and Training sets')
   vFrac = 0.2
   print('Splitting off a validation set of size ' + str(vFrac))
-  val = x.sample(frac = vFrac)
-  x = x[~x.index.isin(val.index)]    #Get the complement
-
-  #Reset the indices
-  x = x.reset_index(drop=True)
-  val = val.reset_index(drop=True)
+  x, val = trainValSplit(x, vFrac)    #Both indexed from 0
 
   #Break into x and y
   # y = x.loc[:,'boatSpeed']
@@ -134,8 +121,8 @@ def main():
   print('Fitting Data with Expanded Linear Regression\n...\n')
   #Best expansion in 1 through 10 is 7
   expandFactor=7
-  xExpand = polyExpand(x,expandFactor)
-  valExpand = polyExpand(val,expandFactor)
+  xExpand = featureStore.expanded(x,expandFactor,'train')    #Memory mapped, expanded only the first run
+  valExpand = featureStore.expanded(val,expandFactor,'val')
 
   print("Sanity check, xExpand shape is: " + str(xExpand.shape))
   print("Sanity check, valExpand shape is: " + str(valExpand.shape))
@@ -0,0 +1,77 @@
+#featureStore.py
+#Keeps expanded design matrices (polyExpand's output) on disk under the cache directory, so fitting the same data
+#again skips the expansion: a stored matrix is memory mapped rather than rebuilt.  Entries are keyed by a
+#fingerprint of the data's inputs (a hash of their bytes, so any change to the data or the split gives a new
+#entry), a split label and the degree.  The store is kept under CESP_FEATURE_BYTES bytes (8GB by default, 0 turns
+#it off) by deleting the least recently used entries first.
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+import cespCache
+from preProcess import inputColumns, expandedWidth, polyExpand, polyExpandChunks
+
+MaxBytes = int(os.environ.get('CESP_FEATURE_BYTES', 8<<30))
+
+#Hash of data's inputs (see polyExpand): their names, dtype and values.  boatSpeed doesn't change the expansion
+def fingerprint(data):
+  cols = inputColumns(data)
+  names = [str(c) for c in data.columns.difference(['boatSpeed'])] if isinstance(data, pd.DataFrame) else len(cols)
+  return cespCache.hashKey(names, *cols)
+
+#File holding the expansion of data to degree, as '<split>_<degree>_<fingerprint>.npy'
+def entryName(data, degree, split='all'):
+  return os.path.join(cespCache.cacheDir('features'), split + '_' + str(degree) + '_' + fingerprint(data) + '.npy')
+
+#Stored entries as (mtime, size, file), least recently used first
+def entries():
+  ret = []
+  for fName in glob.glob(os.path.join(cespCache.cacheDir('features'), '*.npy')):
+    try:
+      st = os.stat(fName)
+    except FileNotFoundError:      #Evicted by another process
+      continue
+    ret.append((st.st_mtime, st.st_size, fName))
+  return sorted(ret)
+
+#Deletes least recently used entries until the store holds at most maxBytes.  Returns the bytes freed
+def evict(maxBytes=None):
+  maxBytes = MaxBytes if maxBytes is None else maxBytes
+  stored = entries()
+  total = sum(size for mtime, size, fName in stored)
+  freed = 0
+  for mtime, size, fName in stored:
+    if total - freed <= maxBytes:
+      break
+    try:
+      os.remove(fName)
+    except FileNotFoundError:
+      pass
+    freed += size
+  return freed
+
+#polyExpand(data, degree) through the store: a memory mapped, read-only DataFrame of the stored expansion, written
+#blockSize rows at a time on a miss (so the expansion is never held in memory whole).  split labels the entry
+#(e.g. 'train' or 'val').  Expansions that can't fit under maxBytes aren't stored and come back from polyExpand
+def expanded(data, degree, split='all', maxBytes=None, blockSize=50000):
+  maxBytes = MaxBytes if maxBytes is None else maxBytes
+  shape = (len(data), expandedWidth(len(inputColumns(data)), degree))
+  need = 8*shape[0]*shape[1]
+  if need > maxBytes:
+    return polyExpand(data, degree)
+
+  fName = entryName(data, degree, split)
+  if os.path.exists(fName):
+    os.utime(fName)            #Marks it recently used
+  else:
+    evict(maxBytes - need)
+    tmp = fName + '.' + str(os.getpid()) + '.tmp'
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=shape, fortran_order=True)
+    buf = np.empty((min(blockSize, shape[0]), shape[1]), order='F')
+    for start, block in polyExpandChunks(data, degree, blockSize, out=buf):
+      out[start:start+len(block)] = block
+    out.flush()
+    del out
+    os.replace(tmp, fName)
+  return pd.DataFrame(np.load(fName, mmap_mode='r'), copy=False)
@@ -4,18 +4,75 @@
 #uses speedModel.py or planingModel.py to create sample data written to a csv file
 #Noise is optionally added to the data
 #Output format is (wind speed (0-18), relative Wind Direction(0-180), main position (0-90), jib position(0-90), boat speed)
+#With --vector the rows are drawn, scored and written in bulk with numpy instead of one at a time, in chunks of
+#--chunk rows so memory stays flat however long the file is
+#--format npy|parquet|arrow (or a fileName with one of those extensions) writes a binary file instead of csv,
+#which the training scripts load through dataLoader without parsing text.  Binary formats imply --vector
+#--workers N generates and writes the chunks as shard files on N processes, then merges them into fileName.  The result
+#is byte for byte the file a single process (or any other N) writes.  Each chunk is one shard, so only files of at
+#least N chunks keep every worker busy.  With --manifest the shards are kept instead, listed in a json manifest that
+#dataLoader can load.  Both imply --vector, even --workers 1
+#--sampler lhs|sobol|grid spreads the inputs more evenly than independent uniform draws (the default), and
+#--sailable <fraction> puts that fraction of the wind directions in the sailable region (windDir >= PointingAngle-10).
+#Both imply --vector
+#--nearOpt <fraction> of the rows get sails near optimal trim (by default 0.1 in the planing model, 0 otherwise),
+#jittered by up to --jitter <deg> with --jitterDist uniform|triangular|normal.  --nearOptTarget planing instead puts
+#them in planing conditions within the +-planingTol window, where the planing boost kicks in.  These imply --vector
+#--compress gzip|zstd|lz4 (or a fileName ending .gz, .zst or .lz4) compresses a csv as it's written, one frame per
+#chunk (zstd on all cores).  Parquet and arrow files are compressed inside instead.  Implies --vector
 
 import sys
 import csv
+import os
+import json
+import shutil
 import getopt
+import warnings
+import importlib
+import multiprocessing as mp
+import queue
+import threading
 import random as r
 import speedModel as sm
 import planingModel as pm
+import numpy as np
 import numpy.random as npr
+import pandas as pd
+from dataLoader import Columns, formatOf, extensionOf, needPyarrow, loadData, splitCodec, codecSuffix, needCodec, Codecs
+
+Models = {'default': sm, 'planing': pm}
+DefaultChunk = 100000      #Rows per chunk (and per shard with --workers) in vectorized mode
+Samplers = ('uniform', 'lhs', 'sobol', 'grid')
+Ranges = np.array([18.0, 180.0, 90.0, 90.0])    #Inputs are drawn from [0,18]x[0,180]x[0,90]x[0,90]
+JitterDists = ('uniform', 'triangular', 'normal')
+NearOptTargets = ('optimal', 'planing')
+
+#How the vectorized generator spreads its rows.  The defaults are the original recipe
+class Sampling:
+  def __init__(self, sampler='uniform', sailable=None, nearOpt=None, jitter=None, jitterDist='uniform',
+               nearOptTarget='optimal'):
+    self.sampler = sampler              #One of Samplers, see unitSample
+    self.sailable = sailable            #Fraction of wind directions >= PointingAngle-10, None for uniform
+    self.nearOpt = nearOpt              #Fraction of rows placed near optimal trim, None for the model's default
+    self.jitter = jitter                #Half width (sd for normal) of the trim jitter in deg, None for the target's default
+    self.jitterDist = jitterDist        #One of JitterDists
+    self.nearOptTarget = nearOptTarget  #One of NearOptTargets
+
+  #Fraction of near-optimal rows: the original 10% in the planing model, none in the speed model
+  def nearOptFraction(self, model):
+    if self.nearOpt is not None:
+      return self.nearOpt
+    return 0.1 if model is pm else 0.0
+
+  #Jitter width: the original 5 deg around optimal, or the planing window itself
+  def jitterWidth(self, model):
+    if self.jitter is not None:
+      return self.jitter
+    return model.defaultBoat().planingTol if self.nearOptTarget == 'planing' else 5.0
 
 #Parse input
 def parseArgs(argv):
-  usage = 'usage: ./generateCSV -l <file length> -s <seed> -f <fileName> --noise <noise> --model <model name>'
+  usage = 'usage: ./generateCSV -l <file length> -s <seed> -f <fileName> --noise <noise> --model <model name> [--vector] --chunk <rows> --format <csv|npy|parquet|arrow> --workers <N> [--manifest] --sampler <uniform|lhs|sobol|grid> --sailable <fraction> --nearOpt <fraction> --jitter <deg> --jitterDist <uniform|triangular|normal> --nearOptTarget <optimal|planing> --compress <gzip|zstd|lz4>'
   if len(argv) == 0:
     print('Not enough args')
     print(usage)
@@ -25,8 +82,15 @@ def parseArgs(argv):
   seed = 0
   fname = "gen.csv"
   speedFunc = ("default",sm.resultantSpeed)
+  vector = False
+  chunkSize = DefaultChunk
+  fmt = None
+  workers = None
+  manifest = False
+  sampling = Sampling()
+  codec = None
   try:
-    opts, args = getopt.getopt(argv,"hf:l:s:m:",["noise=", "file=","model="])
+    opts, args = getopt.getopt(argv,"hf:l:s:m:",["noise=", "file=","model=","vector","chunk=","format=","workers=","manifest","sampler=","sailable=","nearOpt=","jitter=","jitterDist=","nearOptTarget=","compress="])
   except getopt.GetoptError as e:
     print("Parse Error")
     print(e.msg)
@@ -49,24 +113,106 @@ def parseArgs(argv):
     elif opt in ("--model","-m"):
       if arg == "planing":
         speedFunc = ("planing", pm.resultantSpeed)
+    elif opt == "--vector":
+      vector = True
+    elif opt == "--chunk":
+      chunkSize = int(arg)
+    elif opt == "--format":
+      if arg not in Writers:
+        print('Unknown format: ' + arg)
+        print(usage)
+        sys.exit(2)
+      fmt = arg
+    elif opt == "--workers":
+      workers = int(arg)
+    elif opt == "--manifest":
+      manifest = True
+    elif opt == "--sampler":
+      if arg not in Samplers:
+        print('Unknown sampler: ' + arg)
+        print(usage)
+        sys.exit(2)
+      sampling.sampler = arg
+    elif opt == "--sailable":
+      sampling.sailable = float(arg)
+      if not 0 < sampling.sailable <= 1:
+        print('--sailable must be in (0,1]')
+        sys.exit(2)
+    elif opt == "--nearOpt":
+      sampling.nearOpt = float(arg)
+      if not 0 <= sampling.nearOpt <= 1:
+        print('--nearOpt must be in [0,1]')
+        sys.exit(2)
+    elif opt == "--jitter":
+      sampling.jitter = float(arg)
+    elif opt == "--jitterDist":
+      if arg not in JitterDists:
+        print('Unknown jitter distribution: ' + arg)
+        print(usage)
+        sys.exit(2)
+      sampling.jitterDist = arg
+    elif opt == "--nearOptTarget":
+      if arg not in NearOptTargets:
+        print('Unknown near-optimal target: ' + arg)
+        print(usage)
+        sys.exit(2)
+      sampling.nearOptTarget = arg
+    elif opt == "--compress":
+      if arg not in Codecs.values():
+        print('Unknown codec: ' + arg)
+        print(usage)
+        sys.exit(2)
+      codec = arg
+
+  #Without --format/--compress the extension decides, and with them the extension is made to match so the file loads right
+  base, extCodec = splitCodec(fname)
+  if fmt is None:
+    fmt = formatOf(base)
+  elif formatOf(base) != fmt:
+    base = os.path.splitext(base)[0] + extensionOf(fmt)
+  codec = codec or extCodec
+  if codec is not None and fmt == 'npy':
+    print('npy files are memory mapped, so they can\'t be compressed.  Use arrow or parquet')
+    sys.exit(2)
+  if codec == 'gzip' and fmt == 'arrow':
+    print('Arrow files can only be compressed with zstd or lz4')
+    sys.exit(2)
+  fname = base + (codecSuffix(codec) if fmt == 'csv' else '')  #Binary formats compress inside the file
+  if fmt != 'csv' or codec is not None or workers is not None or manifest or vars(sampling) != vars(Sampling()):
+    vector = True
+  workers = workers or 1
 
-  return (length,noise,seed,fname,speedFunc)
+  return (length,noise,seed,fname,speedFunc,vector,chunkSize,fmt,workers,manifest,sampling,codec)
 
 
 def main(argv):
-  length,noise,seed,fname,speedFunc = parseArgs(argv)
+  length,noise,seed,fname,speedFunc,vector,chunkSize,fmt,workers,manifest,sampling,codec = parseArgs(argv)
 
-  print('Using filename: ' + fname)
+  print('Using filename: ' + fname + ' (' + fmt + ('' if codec is None else ', ' + codec) + ')')
   print('Using length: ' + str(length))
   print('Using seed: ' + str(seed))
   print("Using Model: " + speedFunc[0])
   print('Adding Noise: ' + (str(noise) if noise > 0.0001 else "False"))
+  print('Vectorized: ' + (('chunks of ' + str(chunkSize)) if vector else 'False'))
+  if workers > 1 or manifest:
+    print('Sharded: ' + str(workers) + ' workers, ' + ('manifest' if manifest else 'merged'))
+  if vector:
+    print('Sampling: ' + str(vars(sampling)))
 
   cont = input("Continue? [Y/n]:")
   if cont != 'Y':
     print('Exiting...')
     sys.exit(1)
 
+  if vector:
+    generateVec(length,noise,seed,fname,Models[speedFunc[0]],chunkSize,fmt,workers,manifest,sampling,codec)
+  else:
+    generate(length,noise,seed,fname,speedFunc)
+
+
+#Writes length rows of generated data to fname.  speedFunc is a (model name, resultantSpeed function) pair
+#as returned by parseArgs.  No prompting, so other scripts (e.g. noiseSweep.py) can call it directly
+def generate(length,noise,seed,fname,speedFunc):
   #We could be smarter and do this as vector operations,
   #but we're not worried about performance here
   r.seed(seed)
@@ -118,5 +264,343 @@ def main(argv):
 
 
 
+#Shape of the 4-D grid for length points: m^4 for the largest m that fits, then axes grown one point at a time
+#(windSpeed first) while the grid still fits, so it's as close to length points as near-equal sides allow
+def gridShape(length):
+  m = int(round(length**0.25))
+  while m**4 > length:
+    m -= 1
+  shape = [max(m, 1)]*4
+  for i in range(4):
+    if np.prod(shape)//shape[i]*(shape[i]+1) <= length:
+      shape[i] += 1
+  return tuple(shape)
+
+#Rows start..start+n of a length row sample of the unit 4-cube
+#  uniform  independent draws from rng, column by column
+#  lhs      a Latin hypercube per chunk, drawn from rng
+#  sobol    one scrambled Sobol sequence for the whole file, seeded by seed, so chunks continue where the last left off
+#  grid     cell centers of a gridShape(length) grid, windSpeed slowest.  The rows past the grid (fewer than one
+#           grid slice) are filled from the Sobol sequence, so no point is repeated
+def unitSample(sampler, n, rng, seed=0, start=0, length=None):
+  if sampler == 'uniform':
+    return np.column_stack([rng.random(n) for i in range(4)])
+  elif sampler == 'grid':
+    shape = gridShape(length or n)
+    nGrid = min(max(int(np.prod(shape)) - start, 0), n)     #This chunk's rows that are on the grid
+    u = np.empty((n,4))
+    u[:nGrid] = (np.column_stack(np.unravel_index(start + np.arange(nGrid), shape)) + 0.5)/np.array(shape)
+    if nGrid < n:
+      u[nGrid:] = unitSample('sobol', n-nGrid, rng, seed, start+nGrid-int(np.prod(shape)))
+    return u
+
+  from scipy.stats import qmc     #Here rather than at the top so the default sampler doesn't need scipy
+  if sampler == 'lhs':
+    return qmc.LatinHypercube(d=4, seed=rng).random(n)
+  elif sampler == 'sobol':
+    engine = qmc.Sobol(d=4, scramble=True, seed=np.random.default_rng(seed))
+    if start > 0:                         #fast_forward(0) overflows in scipy
+      engine.fast_forward(start)
+    with warnings.catch_warnings():
+      warnings.simplefilter('ignore')     #Sobol warns about chunks that aren't a power of 2 long
+      return engine.random(n)
+  raise ValueError('Unknown sampler: ' + str(sampler))
+
+#Maps unit cube points to (windSpeed, windDir, main, jib).  With sailable a fraction, that fraction of the wind
+#directions goes to the sailable region windDir >= PointingAngle-10 (the rest below it) through a piecewise
+#linear inverse cdf, which keeps the spacing the sampler gave along windDir within each region
+def scaleInputs(u, model, sailable=None):
+  x = u * Ranges
+  if sailable is not None:
+    cut = model.PointingAngle - 10
+    x[:,1] = np.interp(u[:,1], [0, 1-sailable, 1], [0, cut, Ranges[1]])
+  return x
+
+#n draws from jitterDist with half width (sd for normal) w, centered on 0
+def jitterVec(n, w, jitterDist, rng):
+  if jitterDist == 'uniform':
+    sign = np.where(rng.random(n) >= 0.5, 1.0, -1.0)
+    return sign*rng.random(n)*w
+  elif jitterDist == 'triangular':
+    return rng.triangular(-w, 0.0, w, n)
+  elif jitterDist == 'normal':
+    return rng.normal(0.0, w, n)
+  raise ValueError('Unknown jitter distribution: ' + str(jitterDist))
+
+#Fills rows' inputs (in place) with near optimal points: uniform wind, as generate() draws it, or with the planing
+#target wind from the conditions where the boat can plane (windSpeed >= 8, windDir >= PointingAngle+10), and sails
+#at optimal trim plus jitter, clipped to 0-90
+def placeNearOptimal(rows, rng, model, sampling):
+  n = len(rows)
+  if sampling.nearOptTarget == 'planing':
+    lo = model.PointingAngle + 10
+    rows[:,0] = 8 + rng.random(n)*(Ranges[0]-8)
+    rows[:,1] = lo + rng.random(n)*(Ranges[1]-lo)
+  else:
+    rows[:,0] = rng.random(n)*Ranges[0]
+    rows[:,1] = rng.random(n)*Ranges[1]
+  w = sampling.jitterWidth(model)
+  for col, main in ((2,True), (3,False)):
+    rows[:,col] = np.clip(model.optPosVec(rows[:,0],rows[:,1],main) + jitterVec(n, w, sampling.jitterDist, rng), 0, 90)
+
+#Near optimal rows among the first length rows of a file cut into chunkSize chunks (the first frac of every chunk)
+def nearOptRows(length, chunkSize, frac):
+  return (length//chunkSize)*int(chunkSize*frac) + int((length % chunkSize)*frac)
+
+#Returns an (n,5) array of rows (in Columns order) drawn with the numpy Generator rng and scored by model
+#The chunk's first nearOptFraction of rows are drawn near optimal trim (placeNearOptimal), and the rest come from
+#unitSample and scaleInputs.  start is the chunk's first row and length the file's, which is cut into chunkSize
+#chunks (by default just this one).  The sampler only ever sees the non near optimal rows, so a grid or Sobol
+#sequence is spread over exactly those and keeps its stratification.  With the default Sampling this is
+#generate()'s recipe: in the planing model 10% of rows are drawn within 5 deg of optimal trim
+def makeRows(n, noise, rng, model, sampling=None, seed=0, start=0, length=None, chunkSize=None):
+  sampling = sampling or Sampling()
+  length = length or n
+  chunkSize = chunkSize or n
+  frac = sampling.nearOptFraction(model)
+  nSteal = int(n*frac)
+  rows = np.empty((n,len(Columns)))
+  sStart = start - nearOptRows(start, chunkSize, frac)      #Position among the file's sampler rows
+  sLength = length - nearOptRows(length, chunkSize, frac)
+  rows[nSteal:,:4] = scaleInputs(unitSample(sampling.sampler, n-nSteal, rng, seed, sStart, sLength), model,
+                                 sampling.sailable)
+  if nSteal > 0:
+    placeNearOptimal(rows[:nSteal], rng, model, sampling)
+
+  rows[:,4] = model.resultantSpeedVec(rows[:,0],rows[:,1],rows[:,2],rows[:,3])
+  #Might want to obscure the speed output with noise, a gaussian added in one call
+  if noise > 0.0001:
+    rows[:,4] = rng.normal(rows[:,4],noise)
+  return rows
+
+#The numpy Generator for chunk k: child k of SeedSequence(seed), so every chunk has its own independent stream
+#and can be drawn without drawing the ones before it
+def chunkRng(seed, k):
+  return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(k,)))
+
+#Generator yielding the rows in (chunkSize,5) chunks (the last one may be shorter)
+#The near-optimal rows are the first nearOptFraction of every chunk
+def rowChunks(length, noise, seed, model, chunkSize=DefaultChunk, sampling=None):
+  for k, start in enumerate(range(0, length, chunkSize)):
+    yield makeRows(min(chunkSize, length-start), noise, chunkRng(seed, k), model, sampling, seed, start, length,
+                   chunkSize)
+
+#data compressed with codec as one self-contained frame (a gzip member, or a zstd or lz4 frame), or as is for None
+#Frames can be concatenated, so each csv chunk gets its own and the file comes out the same however the chunks
+#were split between workers
+def compressFrame(data, codec):
+  if codec is None:
+    return data
+  mod = needCodec(codec)
+  if codec == 'gzip':
+    return mod.compress(data, compresslevel=6, mtime=0)   #mtime=0 so the bytes only depend on the data
+  elif codec == 'zstd':
+    return mod.ZstdCompressor(level=3, threads=-1).compress(data)
+  return mod.compress(data)
+
+#The (compressed) csv header line
+def csvHeader(codec):
+  return compressFrame((','.join(Columns) + '\n').encode(), codec)
+
+#Chunk writers: constructed with the file name, total row count and codec (None for uncompressed), then write()
+#is called once per chunk in order and close() at the end
+
+#Writes csv text
+class CsvWriter:
+  def __init__(self, fname, length, codec=None):
+    self.codec = codec
+    self.f = open(fname,'wb')
+    self.f.write(csvHeader(codec))  #Nice headers
+
+  def write(self, chunk):
+    text = pd.DataFrame(chunk, columns=Columns).to_csv(header=False, index=False)
+    self.f.write(compressFrame(text.encode(), self.codec))
+
+  def close(self):
+    self.f.close()
+
+#Writes a (length,5) float64 .npy file, column-major so dataLoader can hand out each column as a contiguous
+#view of the memory map.  The file is sized up front and chunks are copied into place
+class NpyWriter:
+  def __init__(self, fname, length, codec=None):
+    if codec is not None:
+      raise ValueError('npy files are memory mapped, so they can\'t be compressed')
+    self.arr = np.lib.format.open_memmap(fname, mode='w+', dtype=np.float64, shape=(length,len(Columns)),
+                                         fortran_order=True)
+    self.pos = 0
+
+  def write(self, chunk):
+    self.arr[self.pos:self.pos+len(chunk)] = chunk
+    self.pos += len(chunk)
+
+  def close(self):
+    self.arr.flush()
+    del self.arr
+
+#A chunk as a pyarrow RecordBatch with the Columns schema
+def recordBatch(pa, chunk):
+  return pa.RecordBatch.from_arrays([pa.array(chunk[:,i]) for i in range(len(Columns))], names=Columns)
+
+#Writes parquet, one row group per chunk
+class ParquetWriter:
+  def __init__(self, fname, length, codec=None):
+    self.pa = needPyarrow('parquet')
+    import pyarrow.parquet as pq
+    schema = self.pa.schema([(c, self.pa.float64()) for c in Columns])
+    self.wr = pq.ParquetWriter(fname, schema, compression=codec or 'snappy')
+
+  def write(self, chunk):
+    self.wr.write_batch(recordBatch(self.pa, chunk))
+
+  def close(self):
+    self.wr.close()
+
+#Writes an Arrow IPC file (the random access format, which can be memory mapped), one record batch per chunk
+#Compressed buffers (zstd or lz4 only) have to be decompressed on load, so aren't zero copy
+class ArrowWriter:
+  def __init__(self, fname, length, codec=None):
+    self.pa = needPyarrow('arrow')
+    schema = self.pa.schema([(c, self.pa.float64()) for c in Columns])
+    self.sink = self.pa.OSFile(fname, 'wb')
+    self.wr = self.pa.ipc.new_file(self.sink, schema, options=self.pa.ipc.IpcWriteOptions(compression=codec))
+
+  def write(self, chunk):
+    self.wr.write_batch(recordBatch(self.pa, chunk))
+
+  def close(self):
+    self.wr.close()
+    self.sink.close()
+
+Writers = {'csv': CsvWriter, 'npy': NpyWriter, 'parquet': ParquetWriter, 'arrow': ArrowWriter}
+
+#Feeds chunks to writer.write() on a background thread through a queue of at most queueSize chunks,
+#so computing the next chunk overlaps with writing the previous one and memory stays at a few chunks
+def writeChunks(chunks, writer, queueSize=2):
+  q = queue.Queue(maxsize=queueSize)
+  errors = []
+  def drain():
+    try:
+      while True:
+        chunk = q.get()
+        if chunk is None:
+          return
+        writer.write(chunk)
+    except BaseException as e:
+      errors.append(e)
+      while q.get() is not None:    #Keep emptying the queue so the producer never blocks
+        pass
+
+  t = threading.Thread(target=drain)
+  t.start()
+  try:
+    for chunk in chunks:
+      if errors:
+        break
+      q.put(chunk)
+  finally:
+    q.put(None)
+    t.join()
+  if errors:
+    raise errors[0]
+
+#File name of shard k of fname, e.g. gen.part00003.csv.gz
+def shardName(fname, k):
+  base, codec = splitCodec(fname)
+  root, ext = os.path.splitext(base)
+  return root + '.part' + '%05d' % k + ext + codecSuffix(codec)
+
+#File name of fname's shard manifest
+def manifestName(fname):
+  return os.path.splitext(splitCodec(fname)[0])[0] + '.manifest.json'
+
+#Pool worker: generates chunk k (the same rows rowChunks() gives for it) and writes it as a standalone file
+def writeShard(args):
+  k, start, n, length, chunkSize, noise, seed, modelName, sampling, fmt, codec, fName = args
+  writer = Writers[fmt](fName, n, codec)
+  try:
+    writer.write(makeRows(n, noise, chunkRng(seed, k), importlib.import_module(modelName), sampling,
+                          seed, start, length, chunkSize))
+  finally:
+    writer.close()
+  return fName
+
+#Writes each chunk of the output as its own shard file on workers processes, returns [(shard file, rows)]
+def writeShards(length, noise, seed, fname, model, chunkSize, fmt, workers, sampling=None, codec=None):
+  jobs = [(k, start, min(chunkSize, length-start), length, chunkSize, noise, seed, model.__name__, sampling, fmt,
+           codec, shardName(fname, k)) for k, start in enumerate(range(0, length, chunkSize))]
+  if len(jobs) < workers:
+    print('Only ' + str(len(jobs)) + ' shards of ' + str(chunkSize) + ' rows for ' + str(workers) +
+          ' workers.  Use a smaller --chunk to use them all (it changes the rows drawn)')
+  with mp.Pool(workers) as pool:
+    for done in pool.imap_unordered(writeShard, jobs):
+      print('Wrote ' + done)
+  return [(job[-1], job[2]) for job in jobs]
+
+#Concatenates the shards into fname in order, then deletes them.  Csv shards are copied byte for byte (minus their
+#headers, which are their own frame when compressed) so nothing is re-parsed or recompressed.  Binary ones go back
+#through the chunk writer
+def mergeShards(shards, fname, fmt, length, codec=None):
+  if fmt == 'csv':
+    header = csvHeader(codec)
+    with open(fname,'wb') as out:
+      out.write(header)
+      for shard, n in shards:
+        with open(shard,'rb') as f:
+          f.seek(len(header))
+          shutil.copyfileobj(f, out)
+  else:
+    writer = Writers[fmt](fname, length, codec)
+    try:
+      for shard, n in shards:
+        writer.write(loadData(shard, cache=False, dtype=np.float64).to_numpy())   #As written, whatever $CESP_DTYPE says
+    finally:
+      writer.close()
+  for shard, n in shards:
+    os.remove(shard)
+
+#Lists the shards in fname's manifest, with enough to regenerate them.  Shard paths are relative to the manifest
+def writeManifest(shards, fname, fmt, length, noise, seed, model, chunkSize, sampling=None, codec=None):
+  meta = {'format': fmt, 'codec': codec, 'columns': Columns, 'length': length, 'noise': noise, 'seed': seed,
+          'model': model.__name__, 'chunk': chunkSize, 'sampling': vars(sampling or Sampling()),
+          'shards': [{'file': os.path.basename(shard), 'rows': n} for shard, n in shards]}
+  with open(manifestName(fname),'w') as f:
+    json.dump(meta, f, indent=1)
+
+#Vectorized generate(): rows are drawn and scored chunkSize at a time and streamed to fname by a writer thread
+#model is the model module (speedModel or planingModel).  Chunk k uses chunkRng(seed,k), so the rows differ
+#from generate()'s for the same seed, but the same seed and chunkSize always give the same file
+#fmt is one of the Writers keys, or None to go by fname's extension
+#With workers > 1 or manifest the chunks are written as shards in parallel (see writeShards), then either merged
+#into fname, which comes out identical to the single process file, or kept and listed in manifestName(fname)
+#sampling (a Sampling, None for the defaults) picks how the rows are spread
+#codec is 'gzip', 'zstd', 'lz4' or None to go by fname's compression suffix (no suffix, no compression)
+def generateVec(length,noise,seed,fname,model,chunkSize=DefaultChunk,fmt=None,workers=1,manifest=False,
+                sampling=None,codec=None):
+  fmt = fmt or formatOf(fname)
+  codec = codec or splitCodec(fname)[1]
+  sampling = sampling or Sampling()
+  nSteal = nearOptRows(length, chunkSize, sampling.nearOptFraction(model))
+  if nSteal > 0:
+    print('Placing ' + str(nSteal) + ' pts near ' + sampling.nearOptTarget + ' trim')
+  if sampling.sampler == 'grid':
+    shape = gridShape(length - nSteal)
+    print('Grid of ' + 'x'.join(str(m) for m in shape) + ' points, plus ' +
+          str(length - nSteal - int(np.prod(shape))) + ' Sobol points')
+  if workers > 1 or manifest:
+    shards = writeShards(length, noise, seed, fname, model, chunkSize, fmt, workers, sampling, codec)
+    if manifest:
+      writeManifest(shards, fname, fmt, length, noise, seed, model, chunkSize, sampling, codec)
+      print('Wrote manifest ' + manifestName(fname))
+    else:
+      mergeShards(shards, fname, fmt, length, codec)
+    return
+
+  writer = Writers[fmt](fname, length, codec)
+  try:
+    writeChunks(rowChunks(length, noise, seed, model, chunkSize, sampling), writer)
+  finally:
+    writer.close()
+
+
 if __name__ == "__main__":
   main(sys.argv[1:])
\ No newline at end of file
@@ -7,40 +7,17 @@ import planingModel as pm
 import numpy as np 
 import pandas as pd
 from sklearn.neighbors import KNeighborsRegressor as KNN
+from dataLoader import loadData, featureView
+from crossValidation import trainValSplit
 import sys
 
 #knn.py       Eric Anderson (5/16)
 # A final draft of modified KNN code.  Must alter hardcoded 'pm/sm' refs to change which model you are using,
 # and for planing code must call with the argument <planing csv file name>
 
-def main(argv):
-  np.random.seed(0)       #For repeatability
-  fName = 'genTrain.csv'
-  if len(argv) >=2:
-    fName = argv[1]
-  #Read in the training data
-  print('Reading data from hardcoded file: ' + fName)
-  with open(fName,'r') as f:
-    x = pd.read_csv(f,nrows= 50000)
-
-  #Get a validation set
-  print('Creating Validation and Training sets')
-  vFrac = 0.2
-  print('Splitting off a validation set of size ' + str(vFrac))
-  val = x.sample(frac = vFrac)
-  x = x[~x.index.isin(val.index)]    #Get the complement
-
-  #Reset the indices
-  x = x.reset_index(drop=True)
-  val = val.reset_index(drop=True)
-
-  print('X and Validation Shapes:')
-  print(x.shape)
-  print(val.shape)
-
-  n = 1000
-  # n = 300
-
+#Fits the KNN to the training data x and returns the scalar controller knnController(windSpeed,windDir)
+#n is the number of neighbors averaged per prediction.  Also used by noiseSweep.py
+def train(x, n=1000):
   #Write my own fit, as I need to have access to the actual neighbors in question:
   #Weighted average of points, using weight like c*speed/d (with appropriate scaling) or speed/exp(d)
   #so we weight close points over fast points (that probably are just for higher windspeeds)
@@ -50,7 +27,7 @@ def main(argv):
   #guesses at the right controls and hopes things work out.
   def myPred(x,xPred,n_neighbors,printMax=False):
     # print('in myPred(), x has null?: ' + str(x.isnull().any().any()))
-    ds,inds = knn.kneighbors(xPred,n_neighbors=n_neighbors)
+    ds,inds = knn.kneighbors(featureView(xPred,['windSpeed','windDir']),n_neighbors=n_neighbors)
     print('Maximum distance point used is : ' + str(ds.max())) if printMax else None
     out=pd.DataFrame(columns=['mainOut','jibOut','boatSpeedOut'])
     for d,ind,i in zip(ds,inds,range(ds.shape[0])):   #This is still dealing with vectors of prediction points
@@ -76,7 +53,7 @@ def main(argv):
     return out
   
   #Wraps the KNN prediction in a nice API
-  #Refs external vars x,n
+  #Refs external vars x,n (train's arguments)
   #Intended to handle only scalar inputs
   def knnController(windSpeed,windDir):
     ret = myPred(x,pd.DataFrame([[windSpeed,windDir]], columns=['windSpeed','windDir']),n)
@@ -94,11 +71,37 @@ def main(argv):
     # return (((x[0]-y[0])**2)/9.0 + ((x[1]-y[1])**2)/4.0)**0.5
 
 
-  print('Fitting Data with KNN Regression (' + str(n) + ' neighbors)\n...\n')
   knn = KNN(n_neighbors=5,metric='pyfunc',func=myDist)
 
   # print(x.loc[:,['windSpeed','windDir']].shape)
-  knn.fit(x.loc[:,['windSpeed','windDir']],x.loc[:,['main','jib','boatSpeed']])
+  knn.fit(featureView(x,['windSpeed','windDir']),featureView(x,['main','jib','boatSpeed']))   #Views, not copies
+
+  return knnController
+
+def main(argv):
+  np.random.seed(0)       #For repeatability
+  fName = 'genTrain.csv'
+  if len(argv) >=2:
+    fName = argv[1]
+  #Read in the training data
+  print('Reading data from hardcoded file: ' + fName)
+  x = loadData(fName, nrows= 50000)
+
+  #Get a validation set
+  print('Creating Validation and Training sets')
+  vFrac = 0.2
+  print('Splitting off a validation set of size ' + str(vFrac))
+  x, val = trainValSplit(x, vFrac)    #Both indexed from 0
+
+  print('X and Validation Shapes:')
+  print(x.shape)
+  print(val.shape)
+
+  n = 1000
+  # n = 300
+
+  print('Fitting Data with KNN Regression (' + str(n) + ' neighbors)\n...\n')
+  knnController = train(x,n)
 
 
   # print('Predicting Training Data')
@@ -119,7 +122,7 @@ def main(argv):
 
 
   if(input('Compare to Optimal Data? [Y/n]:') == 'Y'):
-    mse, perc = pm.coarseErrorvOpt(knnController)
+    mse, perc = pm.coarseErrorvOpt(knnController, workers=None)    #Scalar only, so spread it over every core
     print("MSE versus optimal is " + str(mse))
     print("Percent Error versus optimal is " + str(perc))
 
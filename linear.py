@@ -8,34 +8,138 @@ import planingModel as pm
 import numpy as np 
 import pandas as pd
 from sklearn.linear_model import LinearRegression as LR
-from preProcess import polyExpand
+from preProcess import polyExpand, polyExpandChunks, expandedWidth
+import featureStore
+from evaluation import batchController
+from dataLoader import loadData
+from crossValidation import trainValSplit
 
 
 #linear.py       Eric Anderson (5/16)
 # A final draft of linear regression + basis expansion code.  Must alter hardcoded 'pm/sm' refs to change which model you are using,
 # and for planing code must call with the argument <planing csv file name>
+# Add --stream to fit out of core (fitStreaming), for data whose expansion doesn't fit in memory
+
+#Returns a controller that, for each condition, picks the candidate trim lr predicts is fastest
+#lr must have been fit on polyExpand(data,expandFactor).  The result is a batch controller (see evaluation.py):
+#lrController(wSpd,wDir) as before, with lrBatch attached for evaluators that can use it
+def makeController(lr, expandFactor):
+  #Candidate sail positions for the approximate optimization, in (main,jib) order with main as the outer loop
+  stride=2
+  sailGrid = np.arange(0,91,stride)
+  sailPos = np.array([(m,j) for m in sailGrid for j in sailGrid], dtype=float)
+
+  #Batch controller: predicts the speed of every candidate trim for every condition and keeps the fastest.
+  #Conditions go through chunkSize at a time so the expanded matrix stays around 100MB.  The query goes to
+  #polyExpand as an array with the inputs in its sorted order (jib, main, windDir, windSpeed)
+  def lrBatch(wSpds,wDirs,chunkSize=20):
+    mains = np.empty(len(wSpds))
+    jibs = np.empty(len(wSpds))
+    nPos = len(sailPos)
+    buf = np.empty((min(chunkSize,len(wSpds))*nPos, expandedWidth(4,expandFactor)), order='F')  #Reused by every chunk
+    for start in range(0,len(wSpds),chunkSize):
+      spd = wSpds[start:start+chunkSize]
+      dr = wDirs[start:start+chunkSize]
+      a = np.column_stack((np.tile(sailPos[:,1],len(spd)), np.tile(sailPos[:,0],len(spd)),
+                           np.repeat(dr,nPos), np.repeat(spd,nPos)))
+      spds = lr.predict(next(polyExpandChunks(a,expandFactor,len(a),out=buf))[1]).reshape(len(spd),nPos)
+      best = np.argmax(spds,axis=1)
+      mains[start:start+chunkSize] = sailPos[best,0]
+      jibs[start:start+chunkSize] = sailPos[best,1]
+    return (mains,jibs)
+
+    #Constrained optimization (per condition, with sailPos as a single (main,jib) vector), args = -1.0 to actually get max
+    # print("Beginning optimization")
+    # optRes = Opt.minimize(lrbs,np.zeros(2),args=(-1.0,),bounds=[(0,90),(0,90)], method='SLSQP',
+    #   options={'disp':True})
+    # print("Message from Optimizer:")
+    # print(optRes.message)
+    # aStar=optRes.x
+
+    # if not optRes.success:
+    #   print("Optimization failed, exiting now")
+    #   sys.exit(1)
+
+  return batchController(lrBatch)
+
+#Fits LinearRegression on polyExpand(x,expandFactor) -> boatSpeed without ever building the whole expanded matrix:
+#x goes through chunkSize rows at a time, and only the sums for the normal equations are kept, so memory is
+#O(features^2) instead of O(rows x features).  x can be memory mapped (see dataLoader) and bigger than RAM.
+#Degree 7 terms reach 180^7, so the inputs are first scaled to [-1,1] by their largest magnitude, and the sums are
+#centered and standardized before solving.  The coefficients are then mapped back to unscaled features (the
+#expansion of the scales row holds each term's scale), so the returned model is used exactly like LR().fit's
+def fitStreaming(x, expandFactor=7, chunkSize=50000):
+  inputs = x.columns.difference(['boatSpeed'])
+  scales = pd.DataFrame([[max(abs(x[c].min()), abs(x[c].max())) or 1.0 for c in inputs]], columns=inputs)
+  termScales = polyExpand(scales,expandFactor).to_numpy()[0]
+  boatSpeed = x['boatSpeed'].to_numpy()
+  n = 0
+  sumX = sumY = sumYY = xtx = xty = 0.0
+  for start, a in polyExpandChunks(x,expandFactor,chunkSize):
+    a /= termScales       #Same as expanding the scaled inputs
+    y = boatSpeed[start:start+len(a)].astype(np.float64)
+    n += len(a)
+    sumX = sumX + a.sum(axis=0)
+    sumY += y.sum()
+    sumYY += y @ y
+    xtx = xtx + a.T @ a
+    xty = xty + a.T @ y
+
+  #Centered, standardized normal equations, solved by least squares in case some terms are (nearly) collinear
+  meanX = sumX/n
+  meanY = sumY/n
+  sxx = xtx - n*np.outer(meanX,meanX)
+  sxy = xty - n*meanX*meanY
+  sd = np.sqrt(np.maximum(np.diag(sxx),0))
+  sd[sd == 0] = 1.0
+  b = np.linalg.lstsq(sxx/np.outer(sd,sd), sxy/sd, rcond=None)[0]/sd
+
+  lr = LR()
+  lr.coef_ = b/termScales
+  lr.intercept_ = meanY - meanX @ b
+  lr.n_features_in_ = len(b)
+  return lr
+
+#lr's predictions for every row of x (fit on polyExpand(x,expandFactor)), expanding chunkSize rows at a time into
+#one reused buffer, so bulk prediction never holds more than a chunk of the expanded matrix
+def predictStreaming(lr, x, expandFactor=7, chunkSize=50000):
+  yhat = np.empty(len(x))
+  buf = np.empty((min(chunkSize,len(x)), len(lr.coef_)), order='F')
+  for start, a in polyExpandChunks(x,expandFactor,chunkSize,out=buf):
+    yhat[start:start+len(a)] = lr.predict(a)
+  return yhat
+
+#MSE and R2 of lr on x, predicted with predictStreaming (fitStreaming's counterpart)
+def scoreStreaming(lr, x, expandFactor=7, chunkSize=50000):
+  mse = ((predictStreaming(lr,x,expandFactor,chunkSize) - x['boatSpeed'].to_numpy())**2).mean()
+  return (mse, 1 - mse/x['boatSpeed'].var(ddof=0))
+
+#Fits the expanded linear regression to x and returns its controller (used by noiseSweep.py)
+#streaming fits with fitStreaming, for data too big to expand in memory
+def train(x, expandFactor=7, streaming=False):
+  if streaming:
+    lr = fitStreaming(x,expandFactor)
+  else:
+    lr = LR().fit(polyExpand(x,expandFactor),x.loc[:,'boatSpeed'])
+  return makeController(lr,expandFactor)
 
 def main(argv):
 
   np.random.seed(0)       #For repeatability
   fName = 'genTrain.csv'
-  if len(argv) >=2:
-    fName = argv[1]
+  files = [a for a in argv[1:] if not a.startswith('--')]
+  if len(files) >= 1:
+    fName = files[0]
+  streaming = '--stream' in argv    #Fit out of core with fitStreaming
   #Read in the training data
   print('Reading data from hardcoded file: ' + fName)
-  with open(fName,'r') as f:
-    x = pd.read_csv(f)#, nrows= 10000)
+  x = loadData(fName)#, nrows= 10000)
 
   #Get a validation set
   print('Creating Validation and Training sets')
   vFrac = 0.2
   print('Splitting off a validation set of size ' + str(vFrac))
-  val = x.sample(frac = vFrac)
-  x = x[~x.index.isin(val.index)]    #Get the complement
-
-  #Reset the indices
-  x = x.reset_index(drop=True)
-  val = val.reset_index(drop=True)
+  x, val = trainValSplit(x, vFrac)    #Both indexed from 0
 
   print('X and Validation Shapes:')
   print(x.shape)
@@ -53,69 +157,39 @@ def main(argv):
   print('Fitting Data with Expanded Linear Regression\n...\n')
   #Best expansion in 1 through 10 is 7
   expandFactor=7
-  xExpand = polyExpand(x,expandFactor)
-  valExpand = polyExpand(val,expandFactor)
-
-  print("Sanity check, xExpand shape is: " + str(xExpand.shape))
-  print("Sanity check, valExpand shape is: " + str(valExpand.shape))
-
-  print("Fitting LR")
-  lr = LR().fit(xExpand,x.loc[:,'boatSpeed'])
-
-  print('Predicting Training Data')
-  yhat = lr.predict(xExpand)
-  mse = ((yhat-x.loc[:,'boatSpeed'])**2).mean()
-  print('Training Data MSE: ' + str(mse))
-  print('Training R2: ' + str(lr.score(xExpand,x.loc[:,'boatSpeed'])) + '\n')
-
-
+  if streaming:
+    print("Fitting LR from streamed normal equations")
+    lr = fitStreaming(x,expandFactor)
+
+    print('Predicting Training Data')
+    mse, r2 = scoreStreaming(lr,x,expandFactor)
+    print('Training Data MSE: ' + str(mse))
+    print('Training R2: ' + str(r2) + '\n')
+  else:
+    #Memory mapped from the feature store, so runs on unchanged data skip the expansion
+    xExpand = featureStore.expanded(x,expandFactor,'train')
+
+    print("Sanity check, xExpand shape is: " + str(xExpand.shape))
+
+    print("Fitting LR")
+    lr = LR().fit(xExpand,x.loc[:,'boatSpeed'])
+
+    print('Predicting Training Data')
+    yhat = lr.predict(xExpand)
+    mse = ((yhat-x.loc[:,'boatSpeed'])**2).mean()
+    print('Training Data MSE: ' + str(mse))
+    print('Training R2: ' + str(lr.score(xExpand,x.loc[:,'boatSpeed'])) + '\n')
+    del xExpand
+
+  #Validation is scored a chunk at a time either way, so its expansion is never held whole
   print('Predicting Validation Data')
-  yhat = lr.predict(valExpand)
-  mse = ((yhat-val.loc[:,'boatSpeed'])**2).mean()
+  mse, r2 = scoreStreaming(lr,val,expandFactor)
   print('Validation Data MSE: ' + str(mse))
-  print('Validation R2: ' + str(lr.score(valExpand,val.loc[:,'boatSpeed'])) + '\n')
+  print('Validation R2: ' + str(r2) + '\n')
   
 
 
-  def lrController(wSpd,wDir):
-
-    #SailPos needs to be a single vector for the optimizer. Store in (main,jib) order
-    def lrbs(sailPos,sign=1.0):
-      a = pd.DataFrame()
-      a['main'] = sailPos[:,0]
-      a['jib'] = sailPos[:,1]
-      a['windSpeed'] = pd.Series([wSpd for x in range(len(a.index))])
-      a['windDir'] =  pd.Series([wDir for x in range(len(a.index))])
-      return sign*lr.predict(polyExpand(a,expandFactor))
-
-
-    #Constrained optimization, args = -1.0 to actually get max
-    # print("Beginning optimization")
-    # optRes = Opt.minimize(lrbs,np.zeros(2),args=(-1.0,),bounds=[(0,90),(0,90)], method='SLSQP',
-    #   options={'disp':True})
-    # print("Message from Optimizer:")
-    # print(optRes.message)
-    # aStar=optRes.x
-
-    # if not optRes.success:
-    #   print("Optimization failed, exiting now")
-    #   sys.exit(1)
-
-    #Approximate optimization
-    stride=2
-    res = 90/stride+1
-    sailPos=np.zeros((res**2,2))
-    i = 0;
-    for m in range (0,91,stride):
-      for j in range(0,91,stride):
-        sailPos[i,0]=m
-        sailPos[i,1]=j
-        i = i+1
-
-
-    spds = lrbs(sailPos)
-    i = np.argmax(spds)
-    return(sailPos[i,0],sailPos[i,1])
+  lrController = makeController(lr,expandFactor)
 
   if input('Compare to Optimal? [Y/n]: ' ) == 'Y':
     print("Comparing Controller to Optimal")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+#noiseSweep.py
+#Measures how robust each controller is to noisy training data.  For every (noise, seed) pair a dataset is generated
+#with generateCSV, then every (noise, seed, trainer) cell trains the controller on it (trainer is knn, linear or rf,
+#through their train() functions) and scores it with coarseErrorvOpt.  Cells are spread over a process pool.
+#Datasets and cell results are cached under the cache directory, so re-running (or growing) a sweep only does
+#the cells that are missing.  Results are written to a csv with one row per cell (a failed cell gets NaN scores
+#and its error).
+#usage: ./noiseSweep.py --noise <n1,n2,...> --seeds <s1,s2,...> --trainers <knn,linear,rf> -l <rows> --model <model name> --workers <N> -f <results file>
+
+import os
+import sys
+import csv
+import json
+import getopt
+import importlib
+import itertools
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import cespCache
+import generateCSV as g
+from dataLoader import loadData
+import crossValidation as cv
+import evaluation
+import optReference
+import boatParams
+import preProcess
+import dataLoader
+import speedModel as sm
+import planingModel as pm
+
+Models = {'default': sm, 'planing': pm}
+#Modules besides the trainer whose code goes into a cell's score (loading, splitting, expanding and scoring), so
+#cached results go stale when any of them change.  The model itself is already in the dataset's key
+CellModules = (cv, dataLoader, preProcess, evaluation, optReference, boatParams)
+
+#Cached dataset file for one (model, length, noise, seed), keyed on the source of the generator, the model, the
+#boat constants it's scored with and the writers/columns in dataLoader too
+def datasetName(model, length, noise, seed):
+  key = cespCache.hashKey(model, length, noise, seed, cespCache.sourceKey(g, Models[model], boatParams, dataLoader))
+  return os.path.join(cespCache.cacheDir('noiseSweep'), 'data_' + model + '_' + key + '.npy')
+
+#Generates one dataset unless it's already cached.  Written to a temp file first so a killed run leaves no partial file
+def makeDataset(args):
+  model, length, noise, seed = args
+  fName = datasetName(model, length, noise, seed)
+  if not os.path.exists(fName):
+    tmp = fName + '.' + str(os.getpid()) + '.tmp'
+    g.generateVec(length, noise, seed, tmp, Models[model], fmt='npy')
+    os.replace(tmp, fName)
+  return fName
+
+#Trains and scores one (noise, seed, trainer) cell, or loads its cached result
+#Uses the same 80/20 split as the training scripts, and trains on the 80%
+def scoreCell(args):
+  model, length, noise, seed, trainer = args
+  mod = importlib.import_module(trainer)
+  dataName = datasetName(model, length, noise, seed)
+  resName = os.path.splitext(dataName)[0] + '_' + trainer + '_' + cespCache.sourceKey(mod, *CellModules) + '.json'
+  if os.path.exists(resName):
+    with open(resName,'r') as f:
+      return json.load(f)
+
+  np.random.seed(seed)
+  x = loadData(dataName)
+  x, val = cv.trainValSplit(x, 0.2)
+  controller = mod.train(x)
+  mse, err = Models[model].coarseErrorvOpt(controller)
+
+  res = {'model': model, 'length': length, 'noise': noise, 'seed': seed, 'trainer': trainer,
+         'mse': float(mse), 'meanError': float(err), 'error': ''}
+  tmp = resName + '.' + str(os.getpid()) + '.tmp'
+  with open(tmp,'w') as f:
+    json.dump(res, f)
+  os.replace(tmp, resName)
+  return res
+
+#scoreCell, but a cell that fails comes back as a row with NaN scores and the error, instead of taking the rest of
+#the sweep down with it.  Failures aren't cached, so they're retried on the next run
+def runCell(args):
+  try:
+    return scoreCell(args)
+  except Exception as e:
+    model, length, noise, seed, trainer = args
+    print('Cell ' + str(args) + ' failed: ' + repr(e))
+    return {'model': model, 'length': length, 'noise': noise, 'seed': seed, 'trainer': trainer,
+            'mse': float('nan'), 'meanError': float('nan'), 'error': repr(e)}
+
+#Runs the whole sweep on workers processes and returns the list of cell results (in grid order)
+def sweep(noises, seeds, trainers, length, model='planing', workers=None):
+  datasets = list(itertools.product([model], [length], noises, seeds))
+  cells = [d + (t,) for d in datasets for t in trainers]
+  with mp.Pool(workers or os.cpu_count()) as pool:
+    pool.map(makeDataset, datasets, chunksize=1)
+    return pool.map(runCell, cells, chunksize=1)
+
+def parseList(arg, typ):
+  return [typ(a) for a in arg.split(',') if a != '']
+
+def main(argv):
+  usage = 'usage: ./noiseSweep.py --noise <n1,n2,...> --seeds <s1,s2,...> --trainers <knn,linear,rf> -l <rows> --model <model name> --workers <N> -f <results file>'
+  noises = [0.0]
+  seeds = [0]
+  trainers = ['knn','linear','rf']
+  length = 100000
+  model = 'default'
+  workers = None
+  fname = 'noiseSweep.csv'
+  try:
+    opts, args = getopt.getopt(argv,"hf:l:m:",["noise=","seeds=","trainers=","model=","workers=","file="])
+  except getopt.GetoptError as e:
+    print("Parse Error")
+    print(e.msg)
+    print(usage)
+    sys.exit(2)
+
+  for opt, arg in opts:
+    if opt == '-h':
+      print(usage)
+      sys.exit()
+    elif opt == "--noise":
+      noises = parseList(arg, float)
+    elif opt == "--seeds":
+      seeds = parseList(arg, int)
+    elif opt == "--trainers":
+      trainers = parseList(arg, str)
+    elif opt == "-l":
+      length = int(arg)
+    elif opt in ("--model","-m"):
+      if arg == "planing":
+        model = "planing"
+    elif opt == "--workers":
+      workers = int(arg)
+    elif opt in ("--file","-f"):
+      fname = arg
+
+  print('Sweeping noise ' + str(noises) + ' x seeds ' + str(seeds) + ' x trainers ' + str(trainers))
+  print('Using Model: ' + model + ', length: ' + str(length))
+  results = sweep(noises, seeds, trainers, length, model, workers)
+
+  with open(fname,'w') as f:
+    wr = csv.DictWriter(f, fieldnames=['model','length','noise','seed','trainer','mse','meanError','error'])
+    wr.writeheader()
+    wr.writerows(results)
+  print('Wrote ' + str(len(results)) + ' results to ' + fname)
+  failed = [res for res in results if res.get('error')]
+  if failed:
+    print(str(len(failed)) + ' cells failed, see the error column')
+
+  #Summary over seeds
+  summary = pd.DataFrame(results).groupby(['trainer','noise'])['mse'].agg(['mean','std','count'])
+  print('MSE versus optimal, over seeds:')
+  print(summary)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
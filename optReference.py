@@ -0,0 +1,45 @@
+#optReference.py
+#The optimal (main, jib, speed) reference that controllers are scored against.  It never changes for a given
+#model and grid, so it's computed once per (model, grid) in one vectorized peekOptimalVec pass, memoized in
+#memory, and saved under the cache directory so other processes (e.g. the rest of a sweep) just load it.
+
+import os
+import numpy as np
+import boatParams
+import cespCache
+
+#The grid coarseErrorvOpt scores on
+CoarseSpeeds = np.arange(1,18)
+CoarseDirs = np.arange(50,180)
+
+_memo = {}
+_sources = {}
+
+#Hash of model's and boatParams' source, read once per process
+def modelSource(model):
+  name = cespCache.moduleName(model)
+  if name not in _sources:
+    _sources[name] = cespCache.sourceKey(model, boatParams)
+  return _sources[name]
+
+#Returns (main, jib, speed) arrays of shape (len(speeds), len(dirs)) with model.peekOptimal on that grid
+#A memo hit costs a hash of the (small) grid; the file key adds the model source, which is only read the first time
+def optimalReference(model, speeds=CoarseSpeeds, dirs=CoarseDirs):
+  speeds = np.asarray(speeds, dtype=float)
+  dirs = np.asarray(dirs, dtype=float)
+  name = cespCache.moduleName(model)
+  memoKey = cespCache.hashKey(name, vars(model.defaultBoat()), speeds, dirs)
+  if memoKey in _memo:
+    return _memo[memoKey]
+
+  key = cespCache.hashKey(memoKey, modelSource(model))
+  fName = os.path.join(cespCache.cacheDir('optReference'), name + '_' + key + '.npy')
+  if os.path.exists(fName):
+    ref = np.load(fName)
+  else:
+    S, D = np.meshgrid(speeds, dirs, indexing='ij')
+    ref = np.stack(model.peekOptimalVec(S, D))
+    cespCache.saveArray(fName, ref)
+  ref.setflags(write=False)       #Shared between callers, so nobody gets to modify it
+  _memo[memoKey] = tuple(ref)
+  return _memo[memoKey]
@@ -7,10 +7,14 @@
 #This generator extends speedModel to allow for drastic jumps in speed for near-optimal sail trim,
 #corresponding roughly to a 'planing' mode that you can achieve.
 
+import sys
 import numpy as np
+from boatParams import BoatParams
+import evaluation
 
 #Boat specific constants, set as globals
 PointingAngle = 50    #The best angle we can point without huge speed loss
+                      #(The vectorized model takes these from a boatParams.BoatParams instead, see defaultBoat())
 
 
 #A simple linear interpolation function
@@ -134,19 +138,186 @@ def peekOptimal(windSpeed,windDir):
 
 #Given a controller, returns the MSE versus optimal for a grid of sailing conditions
 # And also the average percent error
-def coarseErrorvOpt(controller):
-  actualSpeed = []
-  optSpeed = []
-  for wSpd in range(1,18):
-    for wDir in range(50,180):
-      m,j = controller(wSpd,wDir)[:2]
-      actualSpeed.append(resultantSpeed(wSpd,wDir,m,j))
-      optSpeed.append(peekOptimal(wSpd,wDir)[2])
-  actualSpeed = np.array(actualSpeed)
-  optSpeed = np.array(optSpeed)
-  mse = ((actualSpeed - optSpeed)**2).mean()
-  percent = abs(np.array(actualSpeed - optSpeed)).mean()
-  return (mse,percent)
+#Controllers with a batch version (see evaluation.py) are asked for the whole grid at once
+#If a responseSurface.SpeedTable is given, the controller's speeds are looked up from it instead of the model
+#Scalar-only controllers are run on workers processes (None = every core)
+def coarseErrorvOpt(controller, table=None, workers=1):
+  return evaluation.coarseErrorvOpt(controller, sys.modules[__name__], table, workers)
+
+#Continuous-domain, quasi-Monte Carlo version of coarseErrorvOpt with confidence intervals and early stopping
+#See evaluation.qmcErrorvOpt for the options
+def qmcErrorvOpt(controller, **kwargs):
+  return evaluation.qmcErrorvOpt(controller, sys.modules[__name__], **kwargs)
+
+##################################
+#       VECTORIZED MODEL         #
+##################################
+#Array-in/array-out versions of the functions above, for scoring whole datasets in one call.
+#Every argument can be a numpy array (or a scalar), and they broadcast against each other.
+#The scalar functions print and return None on illegal inputs; these return NaN for those entries instead,
+#so out of range rows can be found (and counted) with a mask rather than a print per element.
+#The boat constants come from a boatParams.BoatParams (defaultBoat() if none is given), whose fields may be arrays
+#to score many boat configurations at once.
+
+#The BoatParams matching the constants of the scalar model above
+def defaultBoat():
+  return BoatParams(pointingAngle=PointingAngle)
+
+#Vectorized lerp.  NaN wherever val is out of [currentMin,currentMax] (or the range is empty)
+def lerpVec(val, currentMin, currentMax, interpMin, interpMax):
+  val = np.asarray(val, dtype=float)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    percentage = (val-currentMin)/(currentMax-currentMin)
+    ret = interpMin + percentage*(interpMax-interpMin)
+  return np.where((val < currentMin) | (val > currentMax) | (currentMax <= currentMin), np.nan, ret)
+
+#Vectorized maxSpeed
+def maxSpeedVec(windSpeed, windDir, boat=None):
+  boat = boat or defaultBoat()
+  windySpeedFactor = boat.windySpeedFactor
+  beatingFactor = boat.beatingFactor
+  pointingAngle = boat.pointingAngle
+  windSpeed = np.asarray(windSpeed, dtype=float)
+  windDir = np.asarray(windDir, dtype=float)
+
+  #Dependency on wind speed
+  spd = np.select([windSpeed < 2, windSpeed > 15],
+                  [windSpeed, windySpeedFactor*windSpeed],
+                  windSpeed*lerpVec(windSpeed,2,15,1,windySpeedFactor))
+
+  #Dependency on wind angle, np.select takes the first true condition just like the if/elif chain
+  dirFactor = np.select([windDir < pointingAngle-10, windDir < pointingAngle, windDir < 90],
+                        [0.0,
+                         lerpVec(windDir,pointingAngle-10,pointingAngle,0,beatingFactor),
+                         lerpVec(windDir,pointingAngle,90,beatingFactor,1)],
+                        lerpVec(windDir,90,180,1,0.8))
+  return spd*dirFactor
+
+#Vectorized sailPosFactor.  NaN where the sail position or wind direction is illegal
+def sailPosFactorVec(pos, windSpeed, windDir, main=True, boat=None):
+  pos = np.asarray(pos, dtype=float)
+  windDir = np.asarray(windDir, dtype=float)
+  illegal = (pos < 0) | (pos > 90) | (windDir < 0) | (windDir > 180)
+
+  diff = np.abs(pos - optPosVec(windSpeed,windDir,main,boat))
+  factor = np.select([pos > windDir, diff > 30], [0.0, 0.2], lerpVec(diff,0,30,1,0.2))
+  return np.where(illegal, np.nan, factor)
+
+#Vectorized resultantSpeed.  With returnMask=True also returns a boolean mask of the entries
+#the scalar version would have rejected (those speeds are NaN)
+def resultantSpeedVec(windSpeed, windDir, mainPos, jibPos, returnMask=False, boat=None):
+  boat = boat or defaultBoat()
+  percentageMainDriven = boat.percentageMainDriven
+  speed = maxSpeedVec(windSpeed,windDir,boat)
+  sailC = percentageMainDriven*sailPosFactorVec(mainPos,windSpeed,windDir,True,boat) + (1-percentageMainDriven)*sailPosFactorVec(jibPos,windSpeed,windDir,False,boat)
+  speed = speed * sailC + planingBoostVec(windSpeed,windDir,mainPos,jibPos,boat)
+  if returnMask:
+    return (speed, np.isnan(speed))
+  return speed
+
+#Vectorized optPos
+def optPosVec(windSpeed, windDir, main=True, boat=None):
+  boat = boat or defaultBoat()
+  jibOffset = boat.jibOffset
+  pointingAngle = boat.pointingAngle
+  windSpeed = np.asarray(windSpeed, dtype=float)
+  windDir = np.asarray(windDir, dtype=float)
+
+  extraEase = np.where(windSpeed > 12, lerpVec(windSpeed,12,18,0,7), 0.0)
+  if main:
+    pos = np.minimum(lerpVec(windDir,pointingAngle,180,0,90) + extraEase,90)
+  else:
+    pos = np.minimum(lerpVec(windDir,pointingAngle,180,jibOffset,90) + extraEase,90)
+  return np.where(windDir < pointingAngle, 0.0 if main else np.asarray(jibOffset, dtype=float), pos)
+
+#Vectorized planingBoost.  NaN where the optimal trim can't be computed
+def planingBoostVec(windSpeed, windDir, mainPos, jibPos, boat=None):
+  boat = boat or defaultBoat()
+  planingTol = boat.planingTol
+  pointingAngle = boat.pointingAngle
+  windSpeed = np.asarray(windSpeed, dtype=float)
+  windDir = np.asarray(windDir, dtype=float)
+  optMain = optPosVec(windSpeed,windDir,True,boat)
+  optJib = optPosVec(windSpeed,windDir,False,boat)
+
+  #Must be within planingTol of optimal, at a good angle and windspeed
+  inWindow = ~((np.abs(optMain - mainPos) > planingTol) | (np.abs(optJib - jibPos) > planingTol))
+  planing = inWindow & (windDir >= pointingAngle + 10) & (windSpeed >= 8)
+  planeFactor = np.where(windDir < 90, lerpVec(windDir,pointingAngle,90,0.02,0.125), 0.125)
+  boost = np.where(planing, windSpeed * planeFactor, 0.0)
+  return np.where(np.isnan(optMain) | np.isnan(optJib), np.nan, boost)
+
+#Analytic (sub)gradient of sailPosFactorVec with respect to pos
+#Within 30 deg of optimal the factor is lerp(diff,0,30,1,0.2), so it falls off at 0.8/30 per degree either side;
+#it is flat further out and once the sail is backed (pos > windDir).  Exactly at optimal we return 0, which is in
+#the superdifferential of the peak, so gradient ascent stops there.  NaN where the inputs are illegal
+def sailPosFactorGradVec(pos, windSpeed, windDir, main=True, boat=None):
+  pos = np.asarray(pos, dtype=float)
+  windDir = np.asarray(windDir, dtype=float)
+  illegal = (pos < 0) | (pos > 90) | (windDir < 0) | (windDir > 180)
+
+  diff = pos - optPosVec(windSpeed,windDir,main,boat)
+  slope = (0.2-1)/30.0
+  grad = np.select([pos > windDir, np.abs(diff) > 30], [0.0, 0.0], slope*np.sign(diff))
+  return np.where(illegal | np.isnan(diff), np.nan, grad)
+
+#Analytic (sub)gradient of resultantSpeedVec, returns (dSpeed/dMain, dSpeed/dJib) arrays
+#maxSpeed doesn't depend on the sails, so this is just maxSpeed times the weighted sailPosFactor slopes
+#planingBoost is a step in main and jib: flat inside the +-planingTol window around optimal and zero outside it,
+#so it adds nothing to the gradient.  The window is centred on the point the base-speed gradient leads to, so an
+#ascent that converges on optimal trim picks the boost up; use planingBoostVec() to see which points are planing
+def resultantSpeedGradVec(windSpeed, windDir, mainPos, jibPos, boat=None):
+  boat = boat or defaultBoat()
+  percentageMainDriven = boat.percentageMainDriven
+  speed = maxSpeedVec(windSpeed,windDir,boat)
+  dMain = speed*percentageMainDriven*sailPosFactorGradVec(mainPos,windSpeed,windDir,True,boat)
+  dJib = speed*(1-percentageMainDriven)*sailPosFactorGradVec(jibPos,windSpeed,windDir,False,boat)
+  return (dMain, dJib)
+
+#Vectorized peekOptimal, returns (main,jib,speed) arrays
+def peekOptimalVec(windSpeed, windDir, boat=None):
+  optMain = optPosVec(windSpeed,windDir,True,boat)
+  optJib = optPosVec(windSpeed,windDir,False,boat)
+  return (optMain,optJib,resultantSpeedVec(windSpeed,windDir,optMain,optJib,boat=boat))
+
+#Checks the vectorized model against the scalar one on n random in-range points
+#Returns the largest absolute difference (should be exactly 0)
+#Half the points are placed near optimal so the planing window gets exercised too
+def checkVectorized(n=10000, seed=0):
+  rng = np.random.RandomState(seed)
+  wSpd = rng.rand(n)*18
+  wDir = rng.rand(n)*180
+  m = rng.rand(n)*90
+  j = rng.rand(n)*90
+  near = rng.rand(n) < 0.5
+  m[near] = np.clip(optPosVec(wSpd,wDir)[near] + (rng.rand(near.sum())*8 - 4),0,90)
+  j[near] = np.clip(optPosVec(wSpd,wDir,False)[near] + (rng.rand(near.sum())*8 - 4),0,90)
+  vec = resultantSpeedVec(wSpd,wDir,m,j)
+  scalar = np.array([resultantSpeed(a,b,c,d) for a,b,c,d in zip(wSpd,wDir,m,j)])
+  opt = peekOptimalVec(wSpd,wDir)
+  scalarOpt = np.array([peekOptimal(a,b) for a,b in zip(wSpd,wDir)])
+  return max(np.abs(vec-scalar).max(), np.abs(np.column_stack(opt)-scalarOpt).max())
+
+#Checks resultantSpeedGradVec against central differences on n random points
+#Points within h of a kink (backing the sail, 30 deg off or at optimal, or at the planing window edges) are skipped
+#Returns the largest absolute difference
+def checkGradient(n=10000, seed=0, h=1e-4):
+  rng = np.random.RandomState(seed)
+  boat = defaultBoat()
+  wSpd = rng.rand(n)*18
+  wDir = rng.rand(n)*180
+  m = h + rng.rand(n)*(90-2*h)
+  j = h + rng.rand(n)*(90-2*h)
+  optM = optPosVec(wSpd,wDir)
+  optJ = optPosVec(wSpd,wDir,False)
+  dMain, dJib = resultantSpeedGradVec(wSpd,wDir,m,j)
+  fdMain = (resultantSpeedVec(wSpd,wDir,m+h,j) - resultantSpeedVec(wSpd,wDir,m-h,j))/(2*h)
+  fdJib = (resultantSpeedVec(wSpd,wDir,m,j+h) - resultantSpeedVec(wSpd,wDir,m,j-h))/(2*h)
+  smooth = np.ones(n, dtype=bool)
+  for pos, opt in ((m,optM),(j,optJ)):
+    for kink in (wDir, opt, opt-30, opt+30, opt-boat.planingTol, opt+boat.planingTol):
+      smooth &= np.abs(pos-kink) > 2*h
+  return max(np.abs(dMain-fdMain)[smooth].max(), np.abs(dJib-fdJib)[smooth].max())
 
 #Assumptions:
 #On beam reach, you can do windspeed in light wind
@@ -155,6 +326,9 @@ def coarseErrorvOpt(controller):
 #Does heeling matter? Is it implicitly defined?
 #The model only works for conditions up to 18 kt
 def main():
+  print('Vectorized model max difference from scalar model: ' + str(checkVectorized()))
+  print('Analytic gradient max difference from finite differences: ' + str(checkGradient()))
+
   '''
   print('sailPosFactor test\n')
   for wDir in range(0,190,10):
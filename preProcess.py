@@ -1,47 +1,73 @@
+import functools
 import numpy as np 
 import pandas as pd
 
 #preProcess.py        Eric Anderson
 #Contains a final verson of polynomial basis expansion that can be refrenced as a library function
 
-#Returns an X data frame (*without* boatspeed) with polynomial expansion up to power Power.
-#Useful preprocessor for linear regression
-def polyExpand(data, power=1):
-  ret=pd.DataFrame(data.loc[:,data.columns.difference(['boatSpeed'])])
-  ret.columns=list(range(ret.shape[1]))       #Zero index the dataframe
-  
-  p = ret.shape[1]
+#The expansion plan for nInputs inputs up to power degree, worked out once per (nInputs, degree) and memoized.
+#Columns are numbered from 0: the inputs first, then one layer per power.  Within a layer, input i multiplies the
+#previous layer's terms from offsets[i] on, so every monomial appears exactly once.  Returns (blocks, pairs):
+#blocks holds (destination start, input, source start, source end) for each input's block of a layer, and pairs
+#holds (input, source column) for each column past the inputs, i.e. column nInputs+k = input * column
+@functools.lru_cache(maxsize=None)
+def expansionPlan(nInputs, degree):
+  blocks = []
+  pairs = []
+  offsets = list(range(nInputs))      #Where each input's block starts in the previous layer
+  prevStart, prevEnd = 0, nInputs     #The previous layer's columns
+  nextCol = nInputs
+  for trash in range(1,degree):
+    layerStart = nextCol
+    newOffsets = []
+    for i in range(nInputs):
+      newOffsets.append(nextCol - layerStart)
+      blocks.append((nextCol, i, prevStart + offsets[i], prevEnd))
+      pairs.extend((i, src) for src in range(prevStart + offsets[i], prevEnd))
+      nextCol += prevEnd - (prevStart + offsets[i])
+    offsets = newOffsets
+    prevStart, prevEnd = layerStart, nextCol
+  return (tuple(blocks), tuple(pairs))
+
+#Number of columns polyExpand gives for nInputs inputs up to power degree
+def expandedWidth(nInputs, degree):
+  return nInputs + len(expansionPlan(nInputs, degree)[1])
 
-  #Init conditions.  Lots of pointers here
-  nextCol= ret.shape[1]   #Where to write to next
-  offsets = [0,1,2,3]     #Offsets for each j value
-  offset=0                #Each j iter we can calc offsets[i+1], so we need holder for (yet unused) old value
-  eltsInPrevLayers = ret.shape[1]   #Total # elts in previous layers (pointer to start of THIS layer)
-  nPrevPow = ret.shape[1]           #  # elts in last layer
-  
-  for trash in range(1,power):      #Do for a bunch of powers
-    startPrevPow = eltsInPrevLayers- nPrevPow     #Pointer to start of PREVIOUS layer
+#The input columns of data (see polyExpand) as a list of 1-D arrays
+def inputColumns(data):
+  if isinstance(data, pd.DataFrame):
+    return [data[c].to_numpy() for c in data.columns.difference(['boatSpeed'])]
+  return list(np.asarray(data).T)
 
-    # print("  Power is: " + str(trash))
-    # print("  eltsInPrevLayers: " + str(eltsInPrevLayers))
-    # print("  nPrevPow: " + str(nPrevPow))
-    # print("  offsets: " + str(offsets))
-    # print("  startPrevPow: " + str(startPrevPow))
+#Writes the expansion of the input columns cols into out, an (n, expandedWidth) array, and returns out
+def expandInto(cols, power, out):
+  for k, col in enumerate(cols):
+    out[:,k] = col
+  for dst, i, srcStart, srcEnd in expansionPlan(len(cols), power)[0]:
+    np.multiply(out[:,srcStart:srcEnd], out[:,i:i+1], out=out[:,dst:dst+srcEnd-srcStart])
+  return out
 
-    for i in range(p):
-      
-      # print("\ti is " + str(i))
-      # print("\t\toffset is " + str(offset))
-      
-      for j in range(offset,nPrevPow):
-        # print("\t\tj is " + str(j))
-        ret[nextCol] = ret.iloc[:,i]*ret.iloc[:,j+startPrevPow]
-        nextCol = nextCol + 1
-      if i != p-1:
-        offset = offsets[i+1]
-        offsets[i+1] = nextCol- eltsInPrevLayers
-    offset=0
-    nPrevPow = nextCol- eltsInPrevLayers
-    eltsInPrevLayers=nextCol
+#Returns an X data frame (*without* boatspeed) with polynomial expansion up to power Power.
+#Useful preprocessor for linear regression
+#data is a DataFrame, whose inputs are its columns other than boatSpeed in sorted name order (so any number of
+#them), or an (n, nInputs) array already holding just the inputs in that order
+#Always expands in float64, even from float32 data: high powers lose too much precision in float32
+#The whole output is allocated once, column-major so each block of the plan is one contiguous in-place multiply
+def polyExpand(data, power=1):
+  cols = inputColumns(data)
+  ret = np.empty((len(data), expandedWidth(len(cols), power)), order='F')
+  return pd.DataFrame(expandInto(cols, power, ret), copy=False)     #Wraps ret without copying, columns numbered from 0
 
-  return ret
\ No newline at end of file
+#polyExpand for inputs too big to expand in one go: yields (start, block) pairs, block being the expansion of rows
+#start..start+blockSize of data as a plain float64 array, so memory stays at one block however long data is
+#With out (an array of at least (blockSize, expandedWidth) the caller keeps, column-major for speed) every block is
+#written into out, so nothing is allocated, but each block is only valid until the next one is yielded
+def polyExpandChunks(data, power=1, blockSize=50000, out=None):
+  cols = inputColumns(data)
+  width = expandedWidth(len(cols), power)
+  if out is not None and (out.shape[0] < min(blockSize, len(data)) or out.shape[1] != width):
+    raise ValueError('out must be at least ' + str((blockSize, width)) + ', not ' + str(out.shape))
+  for start in range(0, len(data), blockSize):
+    n = min(blockSize, len(data)-start)
+    block = out[:n] if out is not None else np.empty((n, width), order='F')
+    yield (start, expandInto([c[start:start+n] for c in cols], power, block))
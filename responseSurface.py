@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+#responseSurface.py
+#Tabulates speedModel or planingModel on a regular 4-D grid of (windSpeed, windDir, main, jib) and saves the
+#table as a .npy file, which can be memory mapped instead of read into RAM.  SpeedTable then answers speed
+#queries by interpolating from the table, so a lookup costs the same no matter how many branches the model has.
+#usage: ./responseSurface.py -f <table file> --model <model name> --spdStep <kts> --dirStep <deg> --sailStep <deg>
+
+import sys
+import json
+import getopt
+import itertools
+import numpy as np
+import speedModel as sm
+import planingModel as pm
+
+#Each axis is (min, max, step).  The defaults cover the whole domain generateCSV samples from
+DefaultAxes = ((0.0,18.0,1.0), (0.0,180.0,1.0), (0.0,90.0,1.0), (0.0,90.0,1.0))
+
+#Number of grid points along an axis (the last one may fall short of max if step doesn't divide the range)
+def axisLength(axis):
+  lo, hi, step = axis
+  return int(np.floor((hi-lo)/step + 1e-9)) + 1
+
+#Name of the json file holding a table's axes and error bound
+def metaName(fName):
+  return fName + '.json'
+
+#A tabulated speed model.  lookup() has the same signature as resultantSpeedVec
+class SpeedTable:
+  def __init__(self, fName, mmap=True):
+    with open(metaName(fName),'r') as f:
+      meta = json.load(f)
+    self.fName = fName
+    self.model = meta['model']
+    self.axes = tuple(tuple(a) for a in meta['axes'])
+    self.errorBound = meta['errorBound']    #Largest |lookup - model| seen on random off-grid points
+    self.rmsError = meta['rmsError']
+    self.table = np.load(fName, mmap_mode='r' if mmap else None)
+
+  #Quadrilinear interpolation from the table, NaN outside the tabulated domain
+  def lookup(self, windSpeed, windDir, main, jib):
+    pts = np.broadcast_arrays(*[np.asarray(q, dtype=float) for q in (windSpeed, windDir, main, jib)])
+    outside = np.zeros(pts[0].shape, dtype=bool)
+    idx = []
+    frac = []
+    for q, (lo,hi,step), n in zip(pts, self.axes, self.table.shape):
+      outside |= (q < lo) | (q > lo + step*(n-1))
+      t = (q-lo)/step
+      i = np.clip(np.floor(np.nan_to_num(t)).astype(int), 0, n-2)
+      idx.append(i)
+      frac.append(t-i)
+
+    #Weighted sum over the 16 corners of the cell
+    ret = np.zeros(pts[0].shape)
+    for corner in itertools.product((0,1), repeat=4):
+      w = np.ones(pts[0].shape)
+      for c, f in zip(corner, frac):
+        w = w * (f if c else 1-f)
+      ret += w * self.table[tuple(i+c for i,c in zip(idx,corner))]
+    return np.where(outside, np.nan, ret)
+
+#Tabulates model (speedModel or planingModel) on the grid given by axes and writes it to fName
+#The table is filled one wind speed at a time so memory stays at one 3-D slice.
+#Afterwards nCheck random points are used to measure the interpolation error, which is saved with the table
+def buildTable(model, fName, axes=DefaultAxes, dtype=np.float32, nCheck=100000, seed=0):
+  for axis in axes:
+    if axisLength(axis) < 2:
+      raise ValueError('Every axis needs at least two grid points: ' + str(axis))
+  grids = [axis[0] + axis[2]*np.arange(axisLength(axis)) for axis in axes]
+  table = np.lib.format.open_memmap(fName, mode='w+', dtype=dtype, shape=tuple(len(g) for g in grids))
+  D, M, J = np.meshgrid(grids[1], grids[2], grids[3], indexing='ij')
+  for i, wSpd in enumerate(grids[0]):
+    table[i] = model.resultantSpeedVec(wSpd, D, M, J)
+  table.flush()
+  del table
+
+  meta = {'model': model.__name__, 'axes': [list(a) for a in axes], 'dtype': np.dtype(dtype).name,
+          'errorBound': None, 'rmsError': None}
+  with open(metaName(fName),'w') as f:
+    json.dump(meta, f)
+
+  #Measure how far off the interpolation is
+  rng = np.random.RandomState(seed)
+  pts = [lo + rng.rand(nCheck)*(grid[-1]-lo) for (lo,hi,step), grid in zip(axes, grids)]
+  err = np.abs(SpeedTable(fName).lookup(*pts) - model.resultantSpeedVec(*pts))
+  meta['errorBound'] = float(np.nanmax(err))
+  meta['rmsError'] = float(np.sqrt(np.nanmean(err**2)))
+  with open(metaName(fName),'w') as f:
+    json.dump(meta, f)
+  return SpeedTable(fName)
+
+def main(argv):
+  usage = 'usage: ./responseSurface.py -f <table file> --model <model name> --spdStep <kts> --dirStep <deg> --sailStep <deg>'
+  fName = 'speedTable.npy'
+  model = sm
+  spdStep, dirStep, sailStep = [a[2] for a in DefaultAxes[:3]]
+  try:
+    opts, args = getopt.getopt(argv,"hf:m:",["file=","model=","spdStep=","dirStep=","sailStep="])
+  except getopt.GetoptError as e:
+    print("Parse Error")
+    print(e.msg)
+    print(usage)
+    sys.exit(2)
+
+  for opt, arg in opts:
+    if opt == '-h':
+      print(usage)
+      sys.exit()
+    elif opt in ("--file", "-f"):
+      fName = arg
+    elif opt in ("--model","-m"):
+      if arg == "planing":
+        model = pm
+    elif opt == "--spdStep":
+      spdStep = float(arg)
+    elif opt == "--dirStep":
+      dirStep = float(arg)
+    elif opt == "--sailStep":
+      sailStep = float(arg)
+
+  axes = ((0.0,18.0,spdStep), (0.0,180.0,dirStep), (0.0,90.0,sailStep), (0.0,90.0,sailStep))
+  print('Tabulating ' + model.__name__ + ' into ' + fName)
+  tbl = buildTable(model, fName, axes)
+  print('Table shape: ' + str(tbl.table.shape))
+  print('Max interpolation error: ' + str(tbl.errorBound) + ' kts (rms ' + str(tbl.rmsError) + ')')
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -7,12 +7,62 @@ import planingModel as pm
 import numpy as np 
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor as RFR
+from evaluation import batchController
+from dataLoader import loadData, featureView
+from crossValidation import trainValSplit
 import sys
 
 #rf.py       Eric Anderson (5/16)
 # A final draft of random forest code.  Must alter hardcoded 'pm/sm' refs to change which model you are using,
 # and for planing code must call with the argument <planing csv file name>
 
+#Returns a controller that, for each condition, picks the candidate trim rf predicts is fastest
+#The result is a batch controller (see evaluation.py): forestController(windSpeed,windDir) as before,
+#with forestBatch attached for evaluators that can use it
+def makeController(rf):
+  #Candidate sail positions for the approximate optimization, in (main,jib) order with main as the outer loop
+  stride=2
+  sailGrid = np.arange(0,91,stride)
+  sailPos = np.array([(m,j) for m in sailGrid for j in sailGrid], dtype=float)
+
+  #Batch controller: predicts the speed of every candidate trim for every condition and keeps the fastest
+  #Conditions go through chunkSize at a time to bound the size of the query array, whose columns are in
+  #featureView order (jib, main, windDir, windSpeed)
+  def forestBatch(windSpeeds,windDirs,chunkSize=100):
+    mains = np.empty(len(windSpeeds))
+    jibs = np.empty(len(windSpeeds))
+    nPos = len(sailPos)
+    for start in range(0,len(windSpeeds),chunkSize):
+      spd = windSpeeds[start:start+chunkSize]
+      dr = windDirs[start:start+chunkSize]
+      a = np.column_stack((np.tile(sailPos[:,1],len(spd)), np.tile(sailPos[:,0],len(spd)),
+                           np.repeat(dr,nPos), np.repeat(spd,nPos)))
+      spds = rf.predict(a).reshape(len(spd),nPos)
+      best = np.argmax(spds,axis=1)
+      mains[start:start+chunkSize] = sailPos[best,0]
+      jibs[start:start+chunkSize] = sailPos[best,1]
+    return (mains,jibs)
+
+    '''
+    #Old 'optimizer', the above one (adapted from linear code) is better)
+    query = pd.DataFrame(columns = x.columns.difference(['boatSpeed'])) #Empty dataframe with correct columns
+    for m in range(19):       #Check every combination of angles (5 deg resolution)
+      for j in range(19):
+        query.loc[m*19+j,:] = {'windSpeed':windSpeed,'windDir':windDir,'main':m*5,'jib':j*5}
+    pred = pd.DataFrame(rf.predict(query))
+    ind = pred.idxmax()[0]
+    # print((query.loc[ind,'main'],query.loc[ind,'jib']))
+    return (query.loc[ind,'main'],query.loc[ind,'jib'])
+    '''
+
+  return batchController(forestBatch)
+
+#Fits a random forest of f trees to x and returns its controller (used by noiseSweep.py)
+#The forest is fit on views of x's data, so float32 data (see dataLoader) goes in without a copy
+def train(x, f=100):
+  rf = RFR(n_estimators=f, oob_score=True).fit(featureView(x),x['boatSpeed'].to_numpy())
+  return makeController(rf)
+
 def main(argv):
   np.random.seed(0)       #For repeatability
   fName = 'genTrain.csv'
@@ -20,19 +70,13 @@ def main(argv):
     fName = argv[1]
   #Read in the training data
   print('Reading data from hardcoded file: ' + fName)
-  with open(fName,'r') as f:
-    x = pd.read_csv(f)#, nrows= 10000)
+  x = loadData(fName)#, nrows= 10000)
 
   #Get a validation set
   print('Creating Validation and Training sets')
   vFrac = 0.2
   print('Splitting off a validation set of size ' + str(vFrac))
-  val = x.sample(frac = vFrac)
-  x = x[~x.index.isin(val.index)]    #Get the complement
-
-  #Reset the indices
-  x = x.reset_index(drop=True)
-  val = val.reset_index(drop=True)
+  x, val = trainValSplit(x, vFrac)    #Both indexed from 0
 
   print('X and Validation Shapes:')
   print(x.shape)
@@ -40,55 +84,19 @@ def main(argv):
   
   f = 100
   print('Fitting Data with Random Forest (Forest size of : ' + str(f) + ')\n...\n')
-  rf = RFR(n_estimators=f, verbose=2, oob_score=True).fit(x.loc[:,x.columns.difference(['boatSpeed'])],x.loc[:,'boatSpeed'])
+  rf = RFR(n_estimators=f, verbose=2, oob_score=True).fit(featureView(x),x['boatSpeed'].to_numpy())
   
   print('Predicting Training Data')
-  yhat = rf.predict(x.loc[:,x.columns.difference(['boatSpeed'])])
+  yhat = rf.predict(featureView(x))
   mse = ((yhat-x.loc[:,'boatSpeed'])**2).mean()
   print('Training Data MSE: ' + str(mse) + '\n')
 
   print('Predicting Validation Data')
-  yhat = rf.predict(val.loc[:,val.columns.difference(['boatSpeed'])])
+  yhat = rf.predict(featureView(val))
   mse = ((yhat-val.loc[:,'boatSpeed'])**2).mean()
   print('Validation Data MSE: ' + str(mse) + '\n')
 
-  def forestController(windSpeed,windDir):
-    
-    #SailPos needs to be a single vector for the optimizer. Store in (main,jib) order
-    def rfbs(sailPos,sign=1.0):
-      a = pd.DataFrame()
-      a['jib'] = sailPos[:,1]
-      a['main'] = sailPos[:,0]
-      a['windDir'] =  pd.Series([windDir for x in range(len(a.index))])
-      a['windSpeed'] = pd.Series([windSpeed for x in range(len(a.index))])
-      return sign*rf.predict(a)
-    
-    # Approximate optimization
-    stride=2
-    res = 90/stride+1
-    sailPos=np.zeros((res**2,2))
-    i = 0;
-    for m in range (0,91,stride):
-      for j in range(0,91,stride):
-        sailPos[i,0]=m
-        sailPos[i,1]=j
-        i = i+1
-
-    spds = rfbs(sailPos)
-    i = np.argmax(spds)
-    return(sailPos[i,0],sailPos[i,1])
-    
-    '''
-    #Old 'optimizer', the above one (adapted from linear code) is better)
-    query = pd.DataFrame(columns = x.columns.difference(['boatSpeed'])) #Empty dataframe with correct columns
-    for m in range(19):       #Check every combination of angles (5 deg resolution)
-      for j in range(19):
-        query.loc[m*19+j,:] = {'windSpeed':windSpeed,'windDir':windDir,'main':m*5,'jib':j*5}
-    pred = pd.DataFrame(rf.predict(query))
-    ind = pred.idxmax()[0]
-    # print((query.loc[ind,'main'],query.loc[ind,'jib']))
-    return (query.loc[ind,'main'],query.loc[ind,'jib'])
-    '''
+  forestController = makeController(rf)
 
   if(input('Compare to Optimal Data? [Y/n]:') == 'Y'):
     mse, perc = pm.coarseErrorvOpt(forestController)
@@ -65,7 +65,8 @@ def boatImage(main,jib,stbd=False, newColor=(0,0,0,255)):
 
 #Plots sailing polars and sailboat icons with representative sail positions for the optimal controller
 #(as defined in speedModel) if plotOpt is true and for a (presumably) learned controller function
-def vizControlStrategy(controller=None,plotOpt=True,model=sm, rawData = pd.DataFrame()):
+#Speeds come from model, or from table (a responseSurface.SpeedTable) if one is given
+def vizControlStrategy(controller=None,plotOpt=True,model=sm, rawData = pd.DataFrame(), table=None):
   windSpeed = 10
   ax = plt.subplot(111, projection='polar')
   subplots_adjust(bottom=0.20)
@@ -87,15 +88,15 @@ def vizControlStrategy(controller=None,plotOpt=True,model=sm, rawData = pd.DataF
       scat2 = ax.scatter(np.deg2rad(360-tot.loc[:,'windDir']),tot.loc[:,'boatSpeed'],c=tot.loc[:,'boatSpeed'], picker=5, cmap = plt.cm.get_cmap('YlOrRd'),zorder=-1,alpha=0.5)
 
 
-    theta = []
-    r = []
-    optSpeed = []
-    for windDir in range(0,181,5):
-      m,j = controller(windSpeed,windDir)[:2]       
-      s=model.resultantSpeed(windSpeed,windDir,m,j)    #This is the objective function always (while training on gen'ed data)
-      theta.append(windDir)
-      r.append(s)
-      optSpeed.append(model.peekOptimal(windSpeed,windDir)[2])
+    theta = list(range(0,181,5))
+    sails = [controller(windSpeed,windDir)[:2] for windDir in theta]
+    #This is the objective function always (while training on gen'ed data), scored in one call for the whole polar
+    speedFunc = model.resultantSpeedVec if table is None else table.lookup
+    r = speedFunc(windSpeed,theta,[m for m,j in sails],[j for m,j in sails])
+    optMains, optJibs, optSpeed = model.peekOptimalVec(windSpeed,theta)   #One-off speed per slider move, so not cached
+    if table is not None:
+      optSpeed = table.lookup(windSpeed,theta,optMains,optJibs)   #Optimal trim scored the same way as the controller's
+    for windDir,(m,j),s in zip(theta,sails,r):
       #Plot boats
       if(windDir % 20 == 0 and windDir > 35):
         arr = boatImage(m,j,newColor=tuple(255*x for x in color))      #Optional parameter newColor to change color